@@ -1,18 +1,36 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Body
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Body, Response, Query, Header
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Match
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo import monitoring
 import os
 import logging
 import asyncio
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable
 import uuid
+import json
+import base64
+import hashlib
+import time
+import math
+import re
+import threading
+import importlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime, timezone, timedelta
 import jwt
 import bcrypt
+import numpy as np
 import resend
 
 ROOT_DIR = Path(__file__).parent
@@ -23,16 +41,118 @@ resend.api_key = os.environ.get('RESEND_API_KEY', '')
 SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'onboarding@resend.dev')
 ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'admin@guardianai.com')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'guardian-ai-secret')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# Authenticated principals cached per user id; optionally trust the signed role claim on admin routes
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', '1024'))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', '60'))
+AUTH_TRUST_TOKEN_ROLE = os.environ.get('AUTH_TRUST_TOKEN_ROLE', 'false').lower() in ('1', 'true', 'yes')
+
+# Password hashing: bcrypt work factor, dedicated hashing threads, and how many
+# hash/verify calls may be in flight or queued before logins are shed with 503
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', '32'))
+
+# Admin list endpoints: default and maximum page size
+ADMIN_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', '20'))
+ADMIN_MAX_PAGE_SIZE = 100
+
+# Service catalog cache: how often each worker checks the shared catalog version
+SERVICE_CATALOG_REFRESH_SECONDS = float(os.environ.get('SERVICE_CATALOG_REFRESH_SECONDS', '5'))
+
+# Payment status: minimum gap between Stripe lookups for one pending session, and
+# the background sweeper that reconciles pending sessions nobody is polling
+PAYMENT_STATUS_MIN_REFRESH_SECONDS = float(os.environ.get('PAYMENT_STATUS_MIN_REFRESH_SECONDS', '5'))
+PAYMENT_SWEEP_INTERVAL_SECONDS = float(os.environ.get('PAYMENT_SWEEP_INTERVAL_SECONDS', '60'))
+PAYMENT_SWEEP_STALE_SECONDS = float(os.environ.get('PAYMENT_SWEEP_STALE_SECONDS', '120'))
+PAYMENT_SWEEP_MAX_AGE_HOURS = float(os.environ.get('PAYMENT_SWEEP_MAX_AGE_HOURS', '24'))
+PAYMENT_SWEEP_BATCH = int(os.environ.get('PAYMENT_SWEEP_BATCH', '50'))
+PAYMENT_SWEEP_CONCURRENCY = int(os.environ.get('PAYMENT_SWEEP_CONCURRENCY', '5'))
+
+# Payment status long-poll: maximum hold time and the cross-worker polling fallback interval
+PAYMENT_WAIT_MAX_SECONDS = float(os.environ.get('PAYMENT_WAIT_MAX_SECONDS', '25'))
+PAYMENT_WAIT_POLL_SECONDS = float(os.environ.get('PAYMENT_WAIT_POLL_SECONDS', '2'))
+
+# Stripe webhook queue: events are stored on receipt and applied by a background consumer
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', '8'))
+WEBHOOK_BACKOFF_SECONDS = float(os.environ.get('WEBHOOK_BACKOFF_SECONDS', '2'))
+WEBHOOK_POLL_SECONDS = float(os.environ.get('WEBHOOK_POLL_SECONDS', '10'))
+WEBHOOK_LEASE_SECONDS = float(os.environ.get('WEBHOOK_LEASE_SECONDS', '60'))
+
+# Idempotency-Key replay window, and how long a retry waits on a duplicate still in flight
+IDEMPOTENCY_TTL_HOURS = float(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24'))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '15'))
+# A key still in_progress after this long belongs to a request that died; a retry takes it over
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', '120'))
+
+# Email outbox worker: delivery concurrency, retries and burst digests
+EMAIL_OUTBOX_CONCURRENCY = int(os.environ.get('EMAIL_OUTBOX_CONCURRENCY', '4'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', '6'))
+EMAIL_OUTBOX_BACKOFF_SECONDS = float(os.environ.get('EMAIL_OUTBOX_BACKOFF_SECONDS', '5'))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.environ.get('EMAIL_OUTBOX_POLL_SECONDS', '10'))
+EMAIL_OUTBOX_LEASE_SECONDS = float(os.environ.get('EMAIL_OUTBOX_LEASE_SECONDS', '120'))
+EMAIL_OUTBOX_DRAIN_SECONDS = float(os.environ.get('EMAIL_OUTBOX_DRAIN_SECONDS', '10'))
+# When at least this many notifications are waiting they go out as one digest (0 disables)
+EMAIL_DIGEST_THRESHOLD = int(os.environ.get('EMAIL_DIGEST_THRESHOLD', '5'))
+EMAIL_DIGEST_MAX_ITEMS = int(os.environ.get('EMAIL_DIGEST_MAX_ITEMS', '50'))
+
+# Chat response cache for repeated first-turn questions (size 0 disables it)
+CHAT_CACHE_SIZE = int(os.environ.get('CHAT_CACHE_SIZE', '256'))
+CHAT_CACHE_TTL_SECONDS = float(os.environ.get('CHAT_CACHE_TTL_SECONDS', '3600'))
+
+# Chat history storage: 'buckets' appends turns into fixed-size per-session bucket documents
+# (chat_messages is still written as the admin message log); 'flat' reads history from chat_messages
+CHAT_HISTORY_STORAGE = os.environ.get('CHAT_HISTORY_STORAGE', 'buckets')
+CHAT_BUCKET_SIZE = int(os.environ.get('CHAT_BUCKET_SIZE', '50'))
+
+# Chat context window: turns kept verbatim, token budget for summary + verbatim turns,
+# and the size of the rolling summary older turns are folded into
+CHAT_CONTEXT_TURNS = int(os.environ.get('CHAT_CONTEXT_TURNS', '6'))
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get('CHAT_CONTEXT_TOKEN_BUDGET', '3000'))
+CHAT_SUMMARY_MAX_TOKENS = int(os.environ.get('CHAT_SUMMARY_MAX_TOKENS', '400'))
+
+# Local intent router: answers short catalog questions (prices, features, what we
+# offer) from templates before the LLM; a service must match with at least
+# MIN_SCORE cosine similarity and beat the runner-up by MIN_MARGIN
+CHAT_ROUTER_ENABLED = os.environ.get('CHAT_ROUTER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+CHAT_ROUTER_MIN_SCORE = float(os.environ.get('CHAT_ROUTER_MIN_SCORE', '0.3'))
+CHAT_ROUTER_MIN_MARGIN = float(os.environ.get('CHAT_ROUTER_MIN_MARGIN', '0.15'))
+CHAT_ROUTER_MAX_WORDS = int(os.environ.get('CHAT_ROUTER_MAX_WORDS', '16'))
+
+# LLM client manager: live chat objects kept per session_id
+LLM_SESSION_CACHE_SIZE = int(os.environ.get('LLM_SESSION_CACHE_SIZE', '512'))
+LLM_SESSION_TTL_SECONDS = float(os.environ.get('LLM_SESSION_TTL_SECONDS', '1800'))
+
+# LLM scheduler: concurrent provider calls, waiting requests, and the longest a request may queue
+LLM_MAX_IN_FLIGHT = int(os.environ.get('LLM_MAX_IN_FLIGHT', '8'))
+LLM_MAX_QUEUE = int(os.environ.get('LLM_MAX_QUEUE', '32'))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', '10'))
+
+# Hedged chat requests: if the primary model is slower than its recent LLM_HEDGE_PERCENTILE
+# latency, ask a secondary model too and keep the first answer (at most LLM_HEDGE_MAX_RATE of calls)
+LLM_HEDGE_ENABLED = os.environ.get('LLM_HEDGE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+LLM_HEDGE_PROVIDER = os.environ.get('LLM_HEDGE_PROVIDER', 'gemini')
+LLM_HEDGE_MODEL = os.environ.get('LLM_HEDGE_MODEL', 'gemini-2.5-flash')
+LLM_HEDGE_PERCENTILE = float(os.environ.get('LLM_HEDGE_PERCENTILE', '95'))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.environ.get('LLM_HEDGE_MIN_DELAY_SECONDS', '2'))
+LLM_HEDGE_MAX_RATE = float(os.environ.get('LLM_HEDGE_MAX_RATE', '0.1'))
+
+# External integrations: per-call timeouts, and circuit breakers that open after
+# consecutive failures and let a probe through once the reset period has passed
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '45'))
+STRIPE_TIMEOUT_SECONDS = float(os.environ.get('STRIPE_TIMEOUT_SECONDS', '15'))
+RESEND_TIMEOUT_SECONDS = float(os.environ.get('RESEND_TIMEOUT_SECONDS', '15'))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_SECONDS = float(os.environ.get('BREAKER_RESET_SECONDS', '30'))
+BREAKER_HALF_OPEN_PROBES = int(os.environ.get('BREAKER_HALF_OPEN_PROBES', '1'))
+
+# Prometheus /metrics endpoint: optional bearer token required to scrape it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Create the main app
 app = FastAPI(title="Guardian AI API")
 api_router = APIRouter(prefix="/api")
@@ -42,6 +162,159 @@ security = HTTPBearer()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# ==================== METRICS ====================
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+def _label_str(names: tuple, values: tuple, le: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    """Prometheus-style cumulative histogram; thread-safe because pymongo
+    command events arrive on Motor's executor threads"""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        metrics_registry.append(self)
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts, then +Inf count and sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_label_str(self.label_names, labels, str(bound))} {count}")
+            lines.append(f"{self.name}_bucket{_label_str(self.label_names, labels, '+Inf')} {series[-2]}")
+            lines.append(f"{self.name}_sum{_label_str(self.label_names, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_label_str(self.label_names, labels)} {series[-2]}")
+        return lines
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, label_names: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[tuple, float] = {}
+        metrics_registry.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels):
+        self.inc(*labels, amount=-1)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_str(self.label_names, labels)} {value}")
+        return lines
+
+# Histograms/gauges above, plus callables rendering point-in-time values from other components
+metrics_registry: List[Any] = []
+metrics_collectors: List[Callable[[], List[str]]] = []
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served", ("method", "route"))
+mongo_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ("command", "collection", "outcome")
+)
+external_call_duration = Histogram(
+    "external_call_duration_seconds", "LLM, Stripe and Resend call latency", ("integration", "outcome")
+)
+
+def render_metrics() -> str:
+    lines = []
+    for metric in metrics_registry:
+        lines.extend(metric.render())
+    for collector in metrics_collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Feeds mongodb_command_duration_seconds from pymongo command monitoring"""
+
+    def __init__(self):
+        self._collections: Dict[tuple, str] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongo_command_duration.observe(event.duration_micros / 1e6, event.command_name, collection, outcome)
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics()])
+db = client[os.environ['DB_NAME']]
+
+def route_template(scope) -> str:
+    """Route path template (e.g. /api/services/{slug}) so labels stay low-cardinality"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        route = route_template(scope)
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec(method, route)
+            http_request_duration.observe(time.perf_counter() - started, method, route, str(status["code"]))
+
 # ==================== MODELS ====================
 
 class UserCreate(BaseModel):
@@ -65,13 +338,20 @@ class TokenResponse(BaseModel):
     token_type: str
     user: UserResponse
 
+class PricingPlan(BaseModel):
+    id: str
+    name: str
+    price: float = Field(gt=0)
+    period: str
+    features: List[str] = []
+
 class ServiceCreate(BaseModel):
     title: str
     slug: str
     short_description: str
     full_description: str
     features: List[str]
-    pricing: List[Dict[str, Any]]
+    pricing: List[PricingPlan]
     image_url: Optional[str] = None
     icon: str = "Shield"
 
@@ -80,7 +360,7 @@ class ServiceUpdate(BaseModel):
     short_description: Optional[str] = None
     full_description: Optional[str] = None
     features: Optional[List[str]] = None
-    pricing: Optional[List[Dict[str, Any]]] = None
+    pricing: Optional[List[PricingPlan]] = None
     image_url: Optional[str] = None
     icon: Optional[str] = None
 
@@ -135,14 +415,261 @@ class PaymentStatusResponse(BaseModel):
     amount: float
     currency: str
 
+class ContactSummary(BaseModel):
+    id: str
+    name: str
+    email: str
+    subject: str
+    status: str
+    created_at: str
+
+class ContactPage(BaseModel):
+    items: List[ContactSummary]
+    next_cursor: Optional[str] = None
+
+class PaymentSummary(BaseModel):
+    id: str
+    session_id: str
+    pricing_name: Optional[str] = None
+    amount: float
+    currency: str
+    payment_status: str
+    created_at: str
+
+class PaymentPage(BaseModel):
+    items: List[PaymentSummary]
+    next_cursor: Optional[str] = None
+
+class ChatMessageSummary(BaseModel):
+    id: str
+    session_id: str
+    preview: str
+    created_at: str
+
+class ChatMessagePage(BaseModel):
+    items: List[ChatMessageSummary]
+    next_cursor: Optional[str] = None
+
+# ==================== DATABASE INDEXES ====================
+
+# Declared indexes per collection. Every hot lookup in the routes below must be
+# covered here; ensure_indexes() creates anything missing and reports drift.
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("role", ASCENDING)], name="role"),
+    ],
+    "services": [
+        IndexModel([("slug", ASCENDING)], name="slug_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "contacts": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id_desc"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_at_id"),
+    ],
+    "chat_messages": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("session_id", ASCENDING), ("created_at", ASCENDING)], name="session_created_at"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id_desc"),
+    ],
+    "chat_sessions": [
+        IndexModel([("session_id", ASCENDING)], name="session_id_unique", unique=True),
+    ],
+    "chat_session_buckets": [
+        IndexModel([("session_id", ASCENDING), ("created_at", ASCENDING)], name="session_created_at"),
+    ],
+    "email_outbox": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+    ],
+    "payment_transactions": [
+        IndexModel([("session_id", ASCENDING)], name="session_id_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id_desc"),
+        IndexModel([("payment_status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="payment_status_created_at_id"),
+    ],
+    "idempotency_keys": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "webhook_events": [
+        IndexModel([("event_id", ASCENDING)], name="event_id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+    ],
+}
+
+# Last report produced by ensure_indexes(), served on /admin/indexes
+index_report: Dict[str, Any] = {}
+
+def _index_signature(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize an index definition to the fields we compare for drift"""
+    keys = spec["key"].items() if isinstance(spec["key"], dict) else spec["key"]
+    return {
+        "key": [[field, int(direction)] for field, direction in keys],
+        "unique": bool(spec.get("unique", False)),
+        "expire_after_seconds": spec.get("expireAfterSeconds"),
+    }
+
+async def ensure_indexes() -> Dict[str, Any]:
+    """Create missing declared indexes and report drift against what exists in MongoDB"""
+    report: Dict[str, Any] = {}
+    for collection_name, models in INDEX_SPECS.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        entry = {"created": [], "mismatched": [], "undeclared": [], "errors": []}
+        declared_names = set()
+
+        for model in models:
+            spec = model.document
+            name = spec["name"]
+            declared_names.add(name)
+            if name not in existing:
+                try:
+                    await collection.create_indexes([model])
+                    entry["created"].append(name)
+                except (DuplicateKeyError, OperationFailure) as e:
+                    entry["errors"].append({"index": name, "error": str(e)})
+                    logger.error(f"Failed to create index {collection_name}.{name}: {e}")
+            elif _index_signature(existing[name]) != _index_signature(spec):
+                # Never drop/rebuild automatically; an operator has to decide
+                entry["mismatched"].append({
+                    "index": name,
+                    "expected": _index_signature(spec),
+                    "actual": _index_signature(existing[name]),
+                })
+
+        entry["undeclared"] = [name for name in existing if name != "_id_" and name not in declared_names]
+        report[collection_name] = entry
+
+        if entry["created"]:
+            logger.info(f"Created indexes on {collection_name}: {', '.join(entry['created'])}")
+        if entry["mismatched"] or entry["undeclared"]:
+            logger.warning(
+                f"Index drift on {collection_name}: mismatched={[m['index'] for m in entry['mismatched']]} "
+                f"undeclared={entry['undeclared']}"
+            )
+
+    index_report.clear()
+    index_report.update(report)
+    return report
+
+# ==================== PAGINATION ====================
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    raw = json.dumps([doc["created_at"], doc["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), str(item_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def date_range_filter(created_after: Optional[datetime], created_before: Optional[datetime]) -> Dict[str, Any]:
+    """created_at is stored as a UTC ISO string, so ranges compare lexicographically"""
+    bounds = {}
+    for op, value in (("$gte", created_after), ("$lt", created_before)):
+        if value is not None:
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            bounds[op] = value.astimezone(timezone.utc).isoformat()
+    return {"created_at": bounds} if bounds else {}
+
+async def paginate(collection, query: Dict[str, Any], projection: Dict[str, Any], limit: int, cursor: Optional[str]):
+    """Keyset pagination over (created_at, id) descending; returns (items, next_cursor)"""
+    if cursor:
+        created_at, item_id = decode_cursor(cursor)
+        after_cursor = {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": item_id}},
+        ]}
+        query = {"$and": [query, after_cursor]} if query else after_cursor
+
+    docs = await collection.find(query, projection).sort([("created_at", DESCENDING), ("id", DESCENDING)]).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+def chat_message_summary(doc: Dict[str, Any]) -> Dict[str, Any]:
+    message = doc.get("user_message", "")
+    return {
+        "id": doc["id"],
+        "session_id": doc["session_id"],
+        "preview": message if len(message) <= 80 else message[:80] + "...",
+        "created_at": doc["created_at"],
+    }
+
 # ==================== AUTH HELPERS ====================
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode(), hashed.encode())
 
+def password_needs_rehash(hashed: str) -> bool:
+    # bcrypt hashes look like $2b$<rounds>$<salt+digest>
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated bounded thread pool instead of the event loop.
+
+    bcrypt releases the GIL, so the threads hash in parallel while the loop
+    keeps serving other requests. Once PASSWORD_HASH_MAX_QUEUE calls are in
+    flight or waiting, new ones are rejected with 503 instead of queueing.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.shed = 0
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_queue:
+            self.shed += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many authentication requests, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(verify_password, password, hashed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rounds": BCRYPT_ROUNDS,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "shed": self.shed,
+        }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
 def create_token(user_id: str, email: str, role: str) -> str:
     payload = {
         "sub": user_id,
@@ -152,255 +679,2150 @@ def create_token(user_id: str, email: str, role: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user = await db.users.find_one({"id": payload["sub"]}, {"_id": 0})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+class PrincipalCache:
+    """Bounded TTL cache of user documents (without password hashes) keyed by user id.
+
+    Concurrent misses for the same user share one database lookup. Call
+    invalidate() whenever a user's profile or role changes; other workers pick
+    the change up within PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        inflight = self._inflight.get(user_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+            if user is not None:
+                self._entries[user_id] = (user, time.monotonic())
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            future.set_result(user)
+            return user
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._inflight.pop(user_id, None)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
+async def get_token_payload(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+    try:
+        return jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+async def get_current_user(payload: dict = Depends(get_token_payload)):
+    user = await principal_cache.get(payload["sub"])
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+async def require_admin(payload: dict = Depends(get_token_payload)):
+    if AUTH_TRUST_TOKEN_ROLE:
+        # The role claim is signed with JWT_SECRET, so admin routes can skip the lookup
+        if payload.get("role") != "admin":
+            raise HTTPException(status_code=403, detail="Admin access required")
+        return {"id": payload["sub"], "email": payload.get("email"), "role": payload["role"]}
+
+    user = await get_current_user(payload)
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+# ==================== AUTH ROUTES ====================
+
+@api_router.post("/auth/register", response_model=TokenResponse)
+async def register(user_data: UserCreate):
+    existing = await db.users.find_one({"email": user_data.email}, {"_id": 1})
+    if existing:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    user_id = str(uuid.uuid4())
+    user_doc = {
+        "id": user_id,
+        "email": user_data.email,
+        "password": await password_hasher.hash(user_data.password),
+        "name": user_data.name,
+        "role": "user",
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        # Concurrent registration for the same email lost the race on users.email_unique
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    token = create_token(user_id, user_data.email, "user")
+    return TokenResponse(
+        access_token=token,
+        token_type="bearer",
+        user=UserResponse(
+            id=user_id,
+            email=user_data.email,
+            name=user_data.name,
+            role="user",
+            created_at=user_doc["created_at"]
+        )
+    )
+
+@api_router.post("/auth/login", response_model=TokenResponse)
+async def login(credentials: UserLogin):
+    user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
+    if not user or not await password_hasher.verify(credentials.password, user["password"]):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    if password_needs_rehash(user["password"]):
+        # Work factor changed since this hash was made; upgrade it while we have the plaintext
+        try:
+            new_hash = await password_hasher.hash(credentials.password)
+            await db.users.update_one({"id": user["id"]}, {"$set": {"password": new_hash}})
+            principal_cache.invalidate(user["id"])
+        except Exception as e:
+            # The password checked out; an upgrade that fails now is retried on the next login
+            logger.warning(f"Could not rehash password for user {user['id']}: {e}")
+    
+    token = create_token(user["id"], user["email"], user["role"])
+    return TokenResponse(
+        access_token=token,
+        token_type="bearer",
+        user=UserResponse(
+            id=user["id"],
+            email=user["email"],
+            name=user["name"],
+            role=user["role"],
+            created_at=user["created_at"]
+        )
+    )
+
+@api_router.get("/auth/me", response_model=UserResponse)
+async def get_me(user: dict = Depends(get_current_user)):
+    return UserResponse(
+        id=user["id"],
+        email=user["email"],
+        name=user["name"],
+        role=user["role"],
+        created_at=user["created_at"]
+    )
+
+# ==================== SERVICE CATALOG CACHE ====================
+
+def etag_response(request: Request, body: bytes, etag: str) -> Response:
+    """Serve pre-serialized JSON, answering 304 when If-None-Match matches the strong ETag"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # If-None-Match uses weak comparison, so W/"x" matches "x"
+        if "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates):
+            return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _serialize(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _strong_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+class ServiceCatalog:
+    """Versioned in-memory snapshot of the services collection.
+
+    The snapshot is rebuilt whenever the catalog version stamp in db.catalog_meta
+    changes: immediately in the worker that handled the admin write (bump), and
+    within SERVICE_CATALOG_REFRESH_SECONDS in every other worker (watch).
+    Components derived from the catalog register with subscribe() and are
+    called with the catalog after every rebuild.
+    """
+
+    def __init__(self):
+        self.version = -1
+        self.services: List[Dict[str, Any]] = []
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_slug: Dict[str, tuple] = {}
+        self.list_body = b"[]"
+        self.list_etag = _strong_etag(self.list_body)
+        self._lock = asyncio.Lock()
+        self._listeners: List[Callable[["ServiceCatalog"], None]] = []
+
+    def subscribe(self, listener: Callable[["ServiceCatalog"], None]):
+        self._listeners.append(listener)
+
+    @property
+    def loaded(self) -> bool:
+        return self.version >= 0
+
+    async def _current_version(self) -> int:
+        meta = await db.catalog_meta.find_one({"_id": "services"})
+        return meta["version"] if meta else 0
+
+    async def rebuild(self, version: Optional[int] = None):
+        async with self._lock:
+            if version is None:
+                version = await self._current_version()
+            docs = await db.services.find({}, {"_id": 0}).to_list(None)
+
+            services = []
+            for doc in docs:
+                try:
+                    services.append(ServiceResponse(**doc).model_dump())
+                except Exception as e:
+                    logger.error(f"Skipping invalid service document {doc.get('id')}: {e}")
+
+            by_slug = {}
+            for service in services:
+                body = _serialize(service)
+                by_slug[service["slug"]] = (body, _strong_etag(body))
+
+            self.services = services
+            self.by_id = {service["id"]: service for service in services}
+            self.by_slug = by_slug
+            self.list_body = _serialize(services)
+            self.list_etag = _strong_etag(self.list_body)
+            self.version = version
+        logger.info(f"Service catalog rebuilt at version {version} ({len(services)} services)")
+
+        for listener in self._listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                logger.error(f"Service catalog listener {getattr(listener, '__qualname__', listener)} failed: {e}")
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            await self.rebuild()
+
+    async def bump(self):
+        """Record a catalog write and rebuild this worker's snapshot"""
+        meta = await db.catalog_meta.find_one_and_update(
+            {"_id": "services"},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        await self.rebuild(meta["version"])
+
+    async def watch(self):
+        """Pick up catalog writes made by other workers"""
+        while True:
+            await asyncio.sleep(SERVICE_CATALOG_REFRESH_SECONDS)
+            try:
+                version = await self._current_version()
+                if version != self.version:
+                    await self.rebuild(version)
+            except Exception as e:
+                logger.error(f"Service catalog refresh failed: {e}")
+
+service_catalog = ServiceCatalog()
+
+def valid_plans(service: Dict[str, Any]) -> List[PricingPlan]:
+    """The service's plans that parse as PricingPlan; documents written before
+    plans were validated may hold malformed ones, which are skipped"""
+    plans = []
+    for plan in service.get("pricing", []):
+        try:
+            plans.append(PricingPlan.model_validate(plan))
+        except Exception as e:
+            logger.error(f"Skipping invalid pricing plan of service {service.get('id')}: {e}")
+    return plans
+
+# ==================== SERVICES ROUTES ====================
+
+@api_router.get("/services", response_model=List[ServiceResponse])
+async def get_services(request: Request):
+    await service_catalog.ensure_loaded()
+    return etag_response(request, service_catalog.list_body, service_catalog.list_etag)
+
+@api_router.get("/services/{slug}", response_model=ServiceResponse)
+async def get_service(slug: str, request: Request):
+    await service_catalog.ensure_loaded()
+    entry = service_catalog.by_slug.get(slug)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Service not found")
+    body, etag = entry
+    return etag_response(request, body, etag)
+
+@api_router.post("/services", response_model=ServiceResponse)
+async def create_service(service: ServiceCreate, admin: dict = Depends(require_admin)):
+    service_id = str(uuid.uuid4())
+    service_doc = {
+        "id": service_id,
+        **service.model_dump(),
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    try:
+        await db.services.insert_one(service_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Service slug already exists")
+    await service_catalog.bump()
+    return ServiceResponse(**service_doc)
+
+@api_router.put("/services/{service_id}", response_model=ServiceResponse)
+async def update_service(service_id: str, updates: ServiceUpdate, admin: dict = Depends(require_admin)):
+    update_data = {k: v for k, v in updates.model_dump().items() if v is not None}
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No updates provided")
+    
+    result = await db.services.update_one({"id": service_id}, {"$set": update_data})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Service not found")
+    
+    await service_catalog.bump()
+    service = service_catalog.by_id.get(service_id)
+    if not service:
+        service = await db.services.find_one({"id": service_id}, {"_id": 0})
+    return ServiceResponse(**service)
+
+@api_router.delete("/services/{service_id}")
+async def delete_service(service_id: str, admin: dict = Depends(require_admin)):
+    result = await db.services.delete_one({"id": service_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Service not found")
+    await service_catalog.bump()
+    return {"message": "Service deleted"}
+
+# ==================== DASHBOARD STATS ====================
+
+def _utc_iso(offset_seconds: float = 0) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=offset_seconds)).isoformat()
+
+# Rollup document maintained with $inc by every write that affects the dashboard
+STATS_ID = "dashboard"
+STATS_FIELDS = (
+    "total_contacts",
+    "new_contacts",
+    "total_chat_messages",
+    "total_chat_sessions",
+    "total_payments",
+    "successful_payments",
+    "total_revenue",
+)
+
+async def inc_stats(**deltas):
+    deltas = {field: value for field, value in deltas.items() if value}
+    if deltas:
+        await db.stats.update_one({"_id": STATS_ID}, {"$inc": deltas}, upsert=True)
+
+async def get_stats() -> Dict[str, Any]:
+    doc = await db.stats.find_one({"_id": STATS_ID}, {"_id": 0}) or {}
+    return {field: doc.get(field, 0) for field in STATS_FIELDS}
+
+async def rebuild_stats() -> Dict[str, Any]:
+    """Recompute the rollup from the raw collections.
+
+    Writes that land while this runs may be counted twice or not at all, so run
+    it at a quiet moment (it is also run automatically when the rollup is missing).
+    """
+    # Backfill the per-session markers used to count distinct sessions incrementally
+    async for group in db.chat_messages.aggregate([
+        {"$group": {
+            "_id": "$session_id",
+            "message_count": {"$sum": 1},
+            "created_at": {"$min": "$created_at"},
+            "last_activity_at": {"$max": "$created_at"},
+        }}
+    ]):
+        await db.chat_sessions.update_one(
+            {"session_id": group["_id"]},
+            {"$set": {
+                "message_count": group["message_count"],
+                "created_at": group["created_at"],
+                "last_activity_at": group["last_activity_at"],
+            }},
+            upsert=True,
+        )
+
+    revenue = await db.payment_transactions.aggregate([
+        {"$match": {"payment_status": "paid"}},
+        {"$group": {"_id": None, "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+    ]).to_list(1)
+
+    stats = {
+        "total_contacts": await db.contacts.count_documents({}),
+        "new_contacts": await db.contacts.count_documents({"status": "new"}),
+        "total_chat_messages": await db.chat_messages.count_documents({}),
+        "total_chat_sessions": await db.chat_sessions.count_documents({}),
+        "total_payments": await db.payment_transactions.count_documents({}),
+        "successful_payments": revenue[0]["count"] if revenue else 0,
+        "total_revenue": revenue[0]["total"] if revenue else 0,
+        "rebuilt_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await db.stats.replace_one({"_id": STATS_ID}, stats, upsert=True)
+    logger.info(f"Dashboard stats rebuilt: {stats}")
+    return stats
+
+async def record_chat_turn(session_id: str, created_at: str):
+    """Track per-session activity and count the session the first time it is seen"""
+    result = await db.chat_sessions.update_one(
+        {"session_id": session_id},
+        {
+            "$inc": {"message_count": 1},
+            "$set": {"last_activity_at": created_at},
+            "$setOnInsert": {"created_at": created_at},
+        },
+        upsert=True,
+    )
+    await inc_stats(total_chat_messages=1, total_chat_sessions=1 if result.upserted_id else 0)
+
+async def record_payment_status(session_id: str, payment_status: str, status: str) -> Optional[Dict[str, Any]]:
+    """Persist a Stripe status and move revenue in the rollup only on a paid transition
+
+    Returns the transaction's previous status, or None if nothing was updated.
+    """
+    query = {"session_id": session_id}
+    if payment_status != "paid":
+        # A paid session never becomes unpaid; ignore stale reads racing the webhook
+        query["payment_status"] = {"$ne": "paid"}
+    before = await db.payment_transactions.find_one_and_update(
+        query,
+        {"$set": {"payment_status": payment_status, "status": status, "status_checked_at": _utc_iso()}},
+        projection={"_id": 0, "payment_status": 1, "amount": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before and before.get("payment_status") != "paid" and payment_status == "paid":
+        await inc_stats(successful_payments=1, total_revenue=before.get("amount", 0))
+    if before and is_terminal_payment({"payment_status": payment_status, "status": status}):
+        payment_status_broker.publish(session_id)
+    return before
+
+# ==================== RESILIENCE ====================
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an integration whose circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Timeout plus circuit breaker around one external integration.
+
+    Closed: calls pass through with a timeout. After failure_threshold
+    consecutive failures (timeouts included) the circuit opens and calls fail
+    immediately with CircuitOpenError, so callers drop to their fallback
+    without holding a worker on a provider that is down. After reset_seconds
+    it goes half-open and lets half_open_probes calls through: a success
+    closes it again, a failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout_seconds: float,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+        half_open_probes: int = BREAKER_HALF_OPEN_PROBES
+    ):
+        self.name = name
+        self.timeout_seconds = timeout_seconds
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = half_open_probes
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+        circuit_breakers[name] = self
+
+    def retry_after(self) -> float:
+        if self.state == "closed":
+            return 0.0
+        return max(1.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def _admit(self):
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.retry_after())
+            self.state = "half_open"
+            self.probes = 0
+            logger.info(f"{self.name} circuit half-open, probing")
+        if self.state == "half_open":
+            if self.probes >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.retry_after())
+            self.probes += 1
+        self.calls += 1
+
+    def _on_success(self):
+        if self.state != "closed":
+            logger.info(f"{self.name} circuit closed")
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.probes = 0
+
+    def _on_failure(self, error: BaseException):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"{self.name} circuit opened after {self.consecutive_failures} failure(s): {self.last_error}")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.probes = 0
+
+    @asynccontextmanager
+    async def guard(self):
+        """Track the outcome of a block (e.g. consuming a stream) without imposing a timeout"""
+        self._admit()
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            external_call_duration.observe(time.perf_counter() - started, self.name, outcome)
+            self._on_failure(e)
+            raise
+        except BaseException:
+            # Cancelled or closed early: no verdict, but free the probe slot
+            if self.state == "half_open":
+                self.probes = max(0, self.probes - 1)
+            raise
+        else:
+            external_call_duration.observe(time.perf_counter() - started, self.name, "success")
+            self._on_success()
+
+    async def call(self, fn: Callable, *args, **kwargs):
+        async with self.guard():
+            try:
+                return await asyncio.wait_for(fn(*args, **kwargs), self.timeout_seconds)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "timeout_seconds": self.timeout_seconds,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after": round(self.retry_after(), 1),
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+            "last_error": self.last_error,
+        }
+
+circuit_breakers: Dict[str, CircuitBreaker] = {}
+def circuit_breaker_metrics() -> List[str]:
+    states = {"closed": 0, "half_open": 1, "open": 2}
+    lines = [
+        "# HELP circuit_breaker_state 0 closed, 1 half-open, 2 open",
+        "# TYPE circuit_breaker_state gauge",
+    ]
+    lines += [f'circuit_breaker_state{{integration="{name}"}} {states[b.state]}' for name, b in circuit_breakers.items()]
+    lines += ["# HELP circuit_breaker_rejected_total Calls failed fast by an open circuit", "# TYPE circuit_breaker_rejected_total counter"]
+    lines += [f'circuit_breaker_rejected_total{{integration="{name}"}} {b.rejected}' for name, b in circuit_breakers.items()]
+    return lines
+
+metrics_collectors.append(circuit_breaker_metrics)
+
+llm_breaker = CircuitBreaker("llm", LLM_TIMEOUT_SECONDS)
+llm_hedge_breaker = CircuitBreaker("llm_hedge", LLM_TIMEOUT_SECONDS)
+stripe_breaker = CircuitBreaker("stripe", STRIPE_TIMEOUT_SECONDS)
+resend_breaker = CircuitBreaker("resend", RESEND_TIMEOUT_SECONDS)
+
+# ==================== IDEMPOTENCY ====================
+
+class IdempotencyStore:
+    """Replays the first response for a client-supplied Idempotency-Key.
+
+    Keys live in db.idempotency_keys, scoped per endpoint, and expire through
+    a TTL index (expires_at is a BSON date for that reason, unlike the ISO
+    strings used elsewhere). Duplicates arriving on the same worker while the
+    first request is running share its future; duplicates on another worker
+    wait for the stored record to complete. An in_progress record carries a
+    lease and an owner token: if the worker running it dies, or its completion
+    write fails, a retry after the lease expires takes the key over and runs
+    the request again instead of waiting out the TTL.
+    """
+
+    _TAKEN_OVER = object()
+
+    def __init__(self):
+        self._inflight: Dict[str, tuple] = {}
+        self.replayed = 0
+        self.coalesced = 0
+        self.taken_over = 0
+
+    @staticmethod
+    def _fingerprint(payload: Any) -> str:
+        return hashlib.sha256(_serialize(jsonable_encoder(payload))).hexdigest()
+
+    async def run(self, scope: str, key: Optional[str], payload: Any, handler: Callable, response: Optional[Response] = None):
+        """Run handler() once per (scope, key); without a key it simply runs"""
+        if not key:
+            return await handler()
+
+        record_key = f"{scope}:{key}"
+        fingerprint = self._fingerprint(payload)
+        inflight = self._inflight.get(record_key)
+        if inflight:
+            inflight_fingerprint, inflight_future = inflight
+            if inflight_fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            self.coalesced += 1
+            return await asyncio.shield(inflight_future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[record_key] = (fingerprint, future)
+        try:
+            result = await self._execute(record_key, fingerprint, handler, response)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieve it so an unshared future does not log "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._inflight[record_key]
+
+    async def _execute(self, record_key: str, fingerprint: str, handler: Callable, response: Optional[Response]):
+        now = datetime.now(timezone.utc)
+        owner = uuid.uuid4().hex
+        try:
+            await db.idempotency_keys.insert_one({
+                "key": record_key,
+                "fingerprint": fingerprint,
+                "status": "in_progress",
+                "owner": owner,
+                "lease_until": _utc_iso(IDEMPOTENCY_LEASE_SECONDS),
+                "created_at": now.isoformat(),
+                "expires_at": now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+            })
+        except DuplicateKeyError:
+            replayed = await self._replay(record_key, fingerprint, response, owner)
+            if replayed is not self._TAKEN_OVER:
+                return replayed
+
+        try:
+            result = await handler()
+        except BaseException:
+            # Nothing was committed under this key; let the client retry
+            await db.idempotency_keys.delete_one({"key": record_key, "owner": owner, "status": "in_progress"})
+            raise
+
+        try:
+            await db.idempotency_keys.update_one(
+                {"key": record_key, "owner": owner},
+                {"$set": {"status": "completed", "response": jsonable_encoder(result)}, "$unset": {"lease_until": ""}}
+            )
+        except Exception as e:
+            # The request itself succeeded; answer it, and free the key so a retry
+            # re-runs rather than waiting on a record that will never complete
+            logger.error(f"Failed to store idempotent response for {record_key}: {e}")
+            try:
+                await db.idempotency_keys.delete_one({"key": record_key, "owner": owner, "status": "in_progress"})
+            except Exception as e:
+                logger.error(f"Failed to release idempotency key {record_key}, it frees when its lease expires: {e}")
+        return result
+
+    async def _take_over(self, record_key: str, owner: str) -> bool:
+        now = _utc_iso()
+        record = await db.idempotency_keys.find_one_and_update(
+            {"key": record_key, "status": "in_progress", "lease_until": {"$lte": now}},
+            {"$set": {"owner": owner, "lease_until": _utc_iso(IDEMPOTENCY_LEASE_SECONDS)}}
+        )
+        if record is not None:
+            logger.warning(f"Idempotency key {record_key} was abandoned in progress; running the request again")
+        return record is not None
+
+    async def _replay(self, record_key: str, fingerprint: str, response: Optional[Response], owner: str):
+        """Return the stored response, or _TAKEN_OVER once this request owns a stale key"""
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        delay = 0.05
+        while True:
+            record = await db.idempotency_keys.find_one({"key": record_key}, {"_id": 0})
+            if record is None:
+                raise HTTPException(status_code=409, detail="The original request with this Idempotency-Key failed; retry it")
+            if record["fingerprint"] != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            if record["status"] == "completed":
+                self.replayed += 1
+                if response is not None:
+                    response.headers["Idempotent-Replayed"] = "true"
+                return record["response"]
+            stale = "lease_until" in record and record["lease_until"] <= _utc_iso()
+            if stale and await self._take_over(record_key, owner):
+                self.taken_over += 1
+                return self._TAKEN_OVER
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still being processed",
+                    headers={"Retry-After": "1"}
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._inflight), "replayed": self.replayed, "coalesced": self.coalesced, "taken_over": self.taken_over}
+
+idempotency = IdempotencyStore()
+
+# ==================== EMAIL OUTBOX ====================
+
+async def enqueue_email(kind: str, subject: str, html: str, ref_id: Optional[str] = None) -> str:
+    """Persist a notification for the outbox worker; delivery happens off the request path"""
+    now = _utc_iso()
+    email_id = str(uuid.uuid4())
+    await db.email_outbox.insert_one({
+        "id": email_id,
+        "kind": kind,
+        "ref_id": ref_id,
+        "to": [ADMIN_EMAIL],
+        "subject": subject,
+        "html": html,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now
+    })
+    email_outbox.wake()
+    return email_id
+
+class EmailOutboxWorker:
+    """Drains db.email_outbox with bounded concurrency.
+
+    Messages are claimed with a lease, so several API workers can run this
+    side by side and a message held by a crashed worker is retried once its
+    lease expires. Failed sends back off exponentially and are parked as
+    'failed' after EMAIL_OUTBOX_MAX_ATTEMPTS. When EMAIL_DIGEST_THRESHOLD or
+    more notifications are due at once they are combined into one digest.
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(EMAIL_OUTBOX_CONCURRENCY)
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+        self.digests = 0
+
+    def wake(self):
+        self._wakeup.set()
+
+    def start(self) -> asyncio.Task:
+        self._stopping = False
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self, drain_timeout: float = EMAIL_OUTBOX_DRAIN_SECONDS):
+        """Deliver what is already due, then stop; anything left stays queued in MongoDB"""
+        if not self._task:
+            return
+        self._stopping = True
+        self.wake()
+        try:
+            await asyncio.wait_for(self._task, drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Email outbox drain timed out; remaining messages stay queued")
+        except Exception as e:
+            logger.error(f"Email outbox worker stopped with error: {e}")
+        self._task = None
+
+    async def run(self):
+        while True:
+            try:
+                processed = await self.process_due()
+            except Exception as e:
+                logger.error(f"Email outbox error: {e}")
+                processed = 0
+            if processed:
+                continue
+            if self._stopping:
+                return
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), EMAIL_OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = _utc_iso()
+        return await db.email_outbox.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "lease_until": {"$lte": now}},
+            ]},
+            {"$set": {"status": "sending", "lease_until": _utc_iso(EMAIL_OUTBOX_LEASE_SECONDS)}},
+            sort=[("next_attempt_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def process_due(self) -> int:
+        limit = max(EMAIL_DIGEST_MAX_ITEMS, EMAIL_OUTBOX_CONCURRENCY)
+        claimed = []
+        while len(claimed) < limit:
+            message = await self._claim()
+            if not message:
+                break
+            claimed.append(message)
+
+        if not claimed:
+            return 0
+        if EMAIL_DIGEST_THRESHOLD and len(claimed) >= EMAIL_DIGEST_THRESHOLD:
+            await self._deliver(claimed, digest=True)
+        else:
+            await asyncio.gather(*(self._deliver([message]) for message in claimed))
+        return len(claimed)
+
+    async def _deliver(self, messages: List[Dict[str, Any]], digest: bool = False):
+        if digest:
+            params = {
+                "from": SENDER_EMAIL,
+                "to": [ADMIN_EMAIL],
+                "subject": f"{len(messages)} new notifications",
+                "html": "<hr>".join(message["html"] for message in messages)
+            }
+        else:
+            message = messages[0]
+            params = {"from": SENDER_EMAIL, "to": message["to"], "subject": message["subject"], "html": message["html"]}
+
+        ids = [message["id"] for message in messages]
+        async with self._semaphore:
+            try:
+                await resend_breaker.call(asyncio.to_thread, resend.Emails.send, params)
+            except CircuitOpenError as e:
+                # Resend is known to be down: wait for the circuit without spending an attempt
+                await db.email_outbox.update_many(
+                    {"id": {"$in": ids}},
+                    {"$set": {"status": "pending", "next_attempt_at": _utc_iso(e.retry_after)}, "$unset": {"lease_until": ""}}
+                )
+                return
+            except Exception as e:
+                await self._record_failure(messages, e)
+                return
+
+        await db.email_outbox.update_many(
+            {"id": {"$in": ids}},
+            {"$set": {"status": "sent", "sent_at": _utc_iso(), "digest": digest}, "$inc": {"attempts": 1}, "$unset": {"lease_until": ""}}
+        )
+        self.sent += len(messages)
+        if digest:
+            self.digests += 1
+        logger.info(f"Sent {'digest of ' if digest else ''}{len(messages)} outbox email(s): {', '.join(ids)}")
+
+    async def _record_failure(self, messages: List[Dict[str, Any]], error: Exception):
+        for message in messages:
+            attempts = message.get("attempts", 0) + 1
+            if attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+                update = {"status": "failed"}
+                self.failed += 1
+                logger.error(f"Giving up on outbox email {message['id']} after {attempts} attempts: {error}")
+            else:
+                delay = min(EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), 3600)
+                update = {"status": "pending", "next_attempt_at": _utc_iso(delay)}
+                logger.warning(f"Outbox email {message['id']} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+            await db.email_outbox.update_one(
+                {"id": message["id"]},
+                {"$set": {**update, "attempts": attempts, "last_error": str(error)}, "$unset": {"lease_until": ""}}
+            )
+
+    async def stats(self) -> Dict[str, Any]:
+        counts = {}
+        async for group in db.email_outbox.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[group["_id"]] = group["count"]
+        return {"by_status": counts, "sent": self.sent, "failed": self.failed, "digests": self.digests}
+
+email_outbox = EmailOutboxWorker()
+
+# ==================== CONTACT ROUTES ====================
+
+@api_router.post("/contact", response_model=ContactResponse)
+async def submit_contact(
+    contact: ContactCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    return await idempotency.run("contact", idempotency_key, contact, lambda: create_contact(contact), response)
+
+async def create_contact(contact: ContactCreate) -> ContactResponse:
+    contact_id = str(uuid.uuid4())
+    contact_doc = {
+        "id": contact_id,
+        **contact.model_dump(),
+        "status": "new",
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.contacts.insert_one(contact_doc)
+    await inc_stats(total_contacts=1, new_contacts=1)
+    
+    # Queue email notification; the outbox worker delivers it
+    html_content = f"""
+        <h2>New Contact Form Submission</h2>
+        <p><strong>Name:</strong> {contact.name}</p>
+        <p><strong>Email:</strong> {contact.email}</p>
+        <p><strong>Phone:</strong> {contact.phone or 'Not provided'}</p>
+        <p><strong>Subject:</strong> {contact.subject}</p>
+        <p><strong>Message:</strong></p>
+        <p>{contact.message}</p>
+        """
+    await enqueue_email("contact", f"New Contact: {contact.subject}", html_content, ref_id=contact_id)
+    
+    return ContactResponse(**contact_doc)
+
+@api_router.get("/admin/contacts", response_model=ContactPage)
+async def get_contacts(
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    admin: dict = Depends(require_admin)
+):
+    query = date_range_filter(created_after, created_before)
+    if status:
+        query["status"] = status
+    projection = {"_id": 0, **{field: 1 for field in ContactSummary.model_fields}}
+    items, next_cursor = await paginate(db.contacts, query, projection, limit, cursor)
+    return ContactPage(items=items, next_cursor=next_cursor)
+
+@api_router.get("/admin/contacts/{contact_id}", response_model=ContactResponse)
+async def get_contact(contact_id: str, admin: dict = Depends(require_admin)):
+    contact = await db.contacts.find_one({"id": contact_id}, {"_id": 0})
+    if not contact:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    return contact
+
+@api_router.put("/admin/contacts/{contact_id}/status")
+async def update_contact_status(contact_id: str, status: str = Body(..., embed=True), admin: dict = Depends(require_admin)):
+    before = await db.contacts.find_one_and_update(
+        {"id": contact_id},
+        {"$set": {"status": status}},
+        projection={"_id": 0, "status": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not before:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    was_new, is_new = before.get("status") == "new", status == "new"
+    if was_new != is_new:
+        await inc_stats(new_contacts=1 if is_new else -1)
+    return {"message": "Status updated"}
+
+# ==================== CHAT ROUTES ====================
+
+def _format_price(price: float) -> str:
+    return f"${price:,.0f}" if float(price).is_integer() else f"${price:,.2f}"
+
+def _format_period(period: str) -> str:
+    return "one-time" if period == "one-time" else f"per {period}"
+
+# Identical for every request and every catalog version, so it stays a cacheable prompt prefix
+CHAT_SYSTEM_PREFIX = """You are Guardian AI's intelligent assistant, specializing in cybersecurity and AI business solutions.
+You help visitors understand our services and guide them to the right one for their needs.
+Be professional, helpful, and knowledgeable. Keep responses concise but informative.
+Only quote the services and prices listed below; for anything else, suggest contacting our team."""
+
+class ChatPromptBuilder:
+    """System prompt rendered from the service catalog once per catalog version.
+
+    The prompt is CHAT_SYSTEM_PREFIX followed by a compact listing of the live
+    services and plans, so the LLM quotes the same prices as checkout and the
+    services pages. It is rebuilt through service_catalog.subscribe; requests
+    only read the cached string. Per-session text (the conversation summary)
+    goes after it, keeping the prefix byte-identical across requests.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.prompt = prefix
+        self.catalog_version = -1
+        self.prompt_tokens = 0
+        self.builds = 0
+
+    @staticmethod
+    def render_service(index: int, service: Dict[str, Any]) -> str:
+        plans = "; ".join(
+            f"{plan.name} {_format_price(plan.price)} {_format_period(plan.period)}"
+            for plan in valid_plans(service)
+        )
+        lines = [f"{index}. {service['title']} - {service['short_description']}"]
+        if service.get("features"):
+            lines.append(f"   Includes: {'; '.join(service['features'])}")
+        if plans:
+            lines.append(f"   Plans: {plans}")
+        return "\n".join(lines)
+
+    def rebuild(self, catalog: "ServiceCatalog"):
+        # Catalog order is whatever MongoDB returned; sort so every worker renders the same bytes
+        services = sorted(catalog.services, key=lambda service: (service["created_at"], service["slug"]))
+        listing = "\n".join(self.render_service(i, service) for i, service in enumerate(services, 1))
+        self.prompt = f"{self.prefix}\n\nServices:\n{listing}" if services else self.prefix
+        self.catalog_version = catalog.version
+        self.prompt_tokens = chat_context.count_tokens(self.prompt)
+        self.builds += 1
+        # Chat objects hold the previous prompt; rebuild them from history on their next turn
+        llm_clients.clear()
+
+    def system_message(self, summary: Optional[str] = None) -> str:
+        if not summary:
+            return self.prompt
+        return f"{self.prompt}\n\nSummary of the conversation so far:\n{summary}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "catalog_version": self.catalog_version,
+            "builds": self.builds,
+            "prompt_chars": len(self.prompt),
+            "prompt_tokens": self.prompt_tokens,
+            "prompt_sha256": hashlib.sha256(self.prompt.encode("utf-8")).hexdigest()[:16],
+        }
+
+chat_prompt = ChatPromptBuilder(CHAT_SYSTEM_PREFIX)
+service_catalog.subscribe(chat_prompt.rebuild)
+
+CHAT_FALLBACK_RESPONSE = "I apologize, but I'm experiencing technical difficulties. Please try again or contact us directly for assistance."
+
+class LlmClientManager:
+    """Process-level owner of LLM chat objects.
+
+    The integration module is imported once, and LlmChat instances are kept in
+    an LRU keyed by session_id (bounded by size and idle TTL) so a visitor's
+    turns reuse the same object, and the provider client it holds, instead of
+    rebuilding it on every request. Each session has a lock so concurrent turns
+    of one conversation do not interleave on the same object. A chat object is
+    built from the session's bounded context (see ChatContextWindow) on first
+    use, and rebuilt after the context is folded.
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._module = None
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def module(self):
+        if self._module is None:
+            self._module = importlib.import_module("emergentintegrations.llm.chat")
+        return self._module
+
+    def user_message(self, text: str):
+        return self.module.UserMessage(text=text)
+
+    def build_chat(
+        self,
+        session_id: str,
+        provider: str = "openai",
+        model: str = "gpt-5.1",
+        context: Optional[Dict[str, Any]] = None,
+        system_message: Optional[str] = None
+    ):
+        api_key = os.environ.get('EMERGENT_LLM_KEY')
+        context = context or {}
+        return self.module.LlmChat(
+            api_key=api_key,
+            session_id=session_id,
+            system_message=system_message or chat_prompt.system_message(context.get("summary")),
+            initial_messages=chat_context.initial_messages(context.get("turns", [])) or None
+        ).with_model(provider, model)
+
+    def hedge_chat(self, session_id: str):
+        """Secondary-model chat for one hedge, built from the session's current context.
+
+        Never reused: the primary answers most turns without it, and a hedge
+        cancelled mid-turn may hold a user message with no reply.
+        """
+        entry = self._sessions.get(session_id) or {}
+        return self.build_chat(session_id, LLM_HEDGE_PROVIDER, LLM_HEDGE_MODEL, context=entry.get("context"))
+
+    def _expire(self, now: float):
+        # Entries are kept in last-used order, so expired ones sit at the front
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry["last_used"] < self.ttl_seconds or entry["lock"].locked():
+                break
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def _trim(self, keep: str):
+        # Least recently used first; a session mid-turn keeps its entry, or a
+        # second turn could start on a fresh chat object beside it
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if session_id != keep and not self._sessions[session_id]["lock"].locked():
+                del self._sessions[session_id]
+                self.evictions += 1
+
+    def _entry(self, session_id: str) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            self.hits += 1
+            self._sessions.move_to_end(session_id)
+        else:
+            self.misses += 1
+            entry = {"chat": None, "lock": asyncio.Lock()}
+            self._sessions[session_id] = entry
+            if len(self._sessions) > self.max_sessions:
+                self._trim(session_id)
+        entry["last_used"] = now
+        return entry
+
+    @asynccontextmanager
+    async def session(self, session_id: str):
+        """Hold the session's chat object for one turn"""
+        entry = self._entry(session_id)
+        async with entry["lock"]:
+            if entry["chat"] is None:
+                context = await chat_context.load(session_id)
+                entry["context"] = context
+                entry["chat"] = self.build_chat(session_id, context=context)
+                entry.update(chat_context.measure(context))
+            yield entry["chat"]
+        entry["last_used"] = time.monotonic()
+
+    def peek(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """The live entry for a session, without touching LRU order or hit counts"""
+        return self._sessions.get(session_id)
+
+    def evict(self, session_id: str):
+        if self._sessions.pop(session_id, None) is not None:
+            self.evictions += 1
+
+    def clear(self):
+        self._sessions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "live_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+llm_clients = LlmClientManager(LLM_SESSION_CACHE_SIZE, LLM_SESSION_TTL_SECONDS)
+
+class LlmHedger:
+    """Hedges slow primary-model calls with a request to a secondary model.
+
+    The hedge fires once the primary has been running longer than the
+    configured percentile of its recent latencies (never sooner than
+    min_delay_seconds). Whichever model answers successfully first wins and
+    the other call is cancelled. The secondary chat is built per hedge from
+    the session's current summary and turns. Hedges are capped at max_rate of
+    recent requests so a slow provider does not double our traffic, and each hedge
+    needs a free llm_scheduler slot of its own, so hedging never pushes calls
+    past LLM_MAX_IN_FLIGHT or ahead of queued visitors. When the hedge wins,
+    the cancelled primary chat object has lost the turn, so the session's chat
+    objects are evicted and rebuilt from history on the next turn.
+    """
+
+    def __init__(self, enabled: bool, percentile: float, min_delay_seconds: float, max_rate: float, window: int = 200):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay_seconds = min_delay_seconds
+        self.max_rate = max_rate
+        self._latencies: deque = deque(maxlen=window)
+        self._decisions: deque = deque(maxlen=window)
+        self.requests = 0
+        self.fired = 0
+        self.won = 0
+        self.suppressed = 0
+        self.saturated = 0
+
+    def hedge_delay(self) -> float:
+        if len(self._latencies) < 20:
+            return self.min_delay_seconds
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay_seconds, ordered[index])
+
+    def _may_hedge(self) -> bool:
+        return (sum(self._decisions) + 1) / (len(self._decisions) + 1) <= self.max_rate
+
+    async def send(self, session_id: str, chat, user_message) -> str:
+        if not self.enabled:
+            return await llm_breaker.call(chat.send_message, user_message)
+
+        self.requests += 1
+        started = time.monotonic()
+        primary = asyncio.ensure_future(llm_breaker.call(chat.send_message, user_message))
+        tasks = [primary]
+        hedge_slot = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+            if not done and self._may_hedge():
+                hedge_slot = llm_scheduler.try_acquire()
+                if hedge_slot is None:
+                    self.saturated += 1
+            if hedge_slot is None:
+                if not done:
+                    self.suppressed += 1
+                self._decisions.append(False)
+                result = await primary
+                self._latencies.append(time.monotonic() - started)
+                return result
+
+            self.fired += 1
+            self._decisions.append(True)
+            hedge_chat = llm_clients.hedge_chat(session_id)
+            hedge = asyncio.ensure_future(llm_hedge_breaker.call(hedge_chat.send_message, user_message))
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        # A hedge win still tells us the primary took at least this long
+                        self._latencies.append(time.monotonic() - started)
+                        if task is hedge:
+                            self.won += 1
+                            # The primary chat was cancelled mid-turn and is missing this reply
+                            llm_clients.evict(session_id)
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            if hedge_slot is not None:
+                hedge_slot.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "hedge_model": f"{LLM_HEDGE_PROVIDER}/{LLM_HEDGE_MODEL}",
+            "hedge_delay_seconds": round(self.hedge_delay(), 3),
+            "max_rate": self.max_rate,
+            "requests": self.requests,
+            "fired": self.fired,
+            "won": self.won,
+            "suppressed": self.suppressed,
+            "saturated": self.saturated,
+            "fire_rate": round(self.fired / self.requests, 4) if self.requests else 0.0,
+            "win_rate": round(self.won / self.fired, 4) if self.fired else 0.0,
+        }
+
+llm_hedger = LlmHedger(LLM_HEDGE_ENABLED, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_DELAY_SECONDS, LLM_HEDGE_MAX_RATE)
+
+class LlmSlot:
+    """One admitted LLM call; release() is idempotent"""
+
+    def __init__(self, scheduler: "LlmScheduler"):
+        self.scheduler = scheduler
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.scheduler._release(time.monotonic() - self.started)
+
+class LlmScheduler:
+    """Admission control in front of LLM provider calls.
+
+    At most max_in_flight calls run at once; further requests wait in a FIFO
+    queue of at most max_queue. Admission is deadline-aware: using a moving
+    average of call duration, a request whose expected wait exceeds
+    max_wait_seconds is rejected up front with 503 and a Retry-After hint,
+    and a queued request that is still waiting at its deadline is rejected
+    too, so latency stays bounded instead of growing with the backlog.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_wait_seconds: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self.avg_service_seconds: Optional[float] = None
+        self.avg_wait_seconds = 0.0
+        self.peak_queue_depth = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = {"queue_full": 0, "deadline": 0, "timeout": 0}
+
+    def estimated_wait(self, position: int) -> float:
+        """Expected queueing time for the request at `position` (1-based) in the queue"""
+        if self.avg_service_seconds is None:
+            return 0.0
+        return math.ceil(position / self.max_in_flight) * self.avg_service_seconds
+
+    def _reject(self, reason: str, retry_after: float):
+        self.shed[reason] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Our assistant is busy right now, please retry shortly",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    def try_acquire(self) -> Optional[LlmSlot]:
+        """A slot only if one is free right now and nobody is queued; never waits or sheds"""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return LlmSlot(self)
+        return None
+
+    async def acquire(self) -> LlmSlot:
+        llm_slot = self.try_acquire()
+        if llm_slot is not None:
+            return llm_slot
+
+        position = len(self._waiters) + 1
+        if position > self.max_queue:
+            self._reject("queue_full", self.estimated_wait(position))
+        estimate = self.estimated_wait(position)
+        if estimate > self.max_wait_seconds:
+            self._reject("deadline", estimate)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.queued += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, len(self._waiters))
+        enqueued = time.monotonic()
+        try:
+            # asyncio.wait leaves the future alone on timeout, so a slot handed
+            # over at the last moment is never lost
+            await asyncio.wait({future}, timeout=self.max_wait_seconds)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        if not future.done():
+            self._abandon(future)
+            self._reject("timeout", self.estimated_wait(len(self._waiters) + 1))
+
+        waited = time.monotonic() - enqueued
+        self.avg_wait_seconds = 0.8 * self.avg_wait_seconds + 0.2 * waited
+        self.admitted += 1
+        return LlmSlot(self)
+
+    def _abandon(self, future: asyncio.Future):
+        if future.done() and not future.cancelled():
+            # A slot was handed over just as the caller gave up; pass it on
+            self._release(None)
+            return
+        future.cancel()
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+    def _release(self, service_seconds: Optional[float]):
+        if service_seconds is not None:
+            if self.avg_service_seconds is None:
+                self.avg_service_seconds = service_seconds
+            else:
+                self.avg_service_seconds = 0.8 * self.avg_service_seconds + 0.2 * service_seconds
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot straight to the next waiter; in_flight is unchanged
+                waiter.set_result(True)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        llm_slot = await self.acquire()
+        try:
+            yield llm_slot
+        finally:
+            llm_slot.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "peak_queue_depth": self.peak_queue_depth,
+            "max_wait_seconds": self.max_wait_seconds,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": dict(self.shed),
+            "avg_service_seconds": round(self.avg_service_seconds or 0.0, 4),
+            "avg_wait_seconds": round(self.avg_wait_seconds, 4),
+        }
+
+llm_scheduler = LlmScheduler(LLM_MAX_IN_FLIGHT, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT_SECONDS)
+
+def llm_scheduler_metrics() -> List[str]:
+    return [
+        "# TYPE llm_scheduler_in_flight gauge",
+        f"llm_scheduler_in_flight {llm_scheduler.in_flight}",
+        "# TYPE llm_scheduler_queue_depth gauge",
+        f"llm_scheduler_queue_depth {len(llm_scheduler._waiters)}",
+        "# TYPE llm_scheduler_shed_total counter",
+        *[f'llm_scheduler_shed_total{{reason="{reason}"}} {count}' for reason, count in llm_scheduler.shed.items()],
+    ]
+
+metrics_collectors.append(llm_scheduler_metrics)
+
+async def save_chat_turn(
+    session_id: str, user_message: str, ai_response: str, prompt_tokens: Optional[int] = None
+) -> Dict[str, Any]:
+    chat_doc = {
+        "id": str(uuid.uuid4()),
+        "session_id": session_id,
+        "user_message": user_message,
+        "ai_response": ai_response,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    if prompt_tokens is not None:
+        chat_doc["prompt_tokens"] = prompt_tokens
+    await db.chat_messages.insert_one(chat_doc)
+    if CHAT_HISTORY_STORAGE == "buckets":
+        await append_to_bucket(chat_doc)
+    await record_chat_turn(session_id, chat_doc["created_at"])
+    return chat_doc
+
+CHAT_SUMMARY_SYSTEM_MESSAGE = """You maintain a running summary of a conversation between a website visitor and Guardian AI's assistant.
+Merge the existing summary with the new turns you are given. Keep the visitor's needs and circumstances,
+details they shared, services and prices discussed, and any open questions. Reply with the summary only,
+as plain prose of at most {words} words."""
+
+chat_prompt_tokens = Histogram(
+    "chat_prompt_tokens", "Estimated prompt size per chat turn", (),
+    buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+)
+
+class ChatContextWindow:
+    """Keeps the prompt for a chat session bounded.
+
+    The last CHAT_CONTEXT_TURNS turns are sent verbatim; older turns are folded
+    into a rolling summary stored on the session's chat_sessions document
+    (summary, summarized_turns) and appended to the catalog system prompt. The
+    summary plus verbatim turns must fit in CHAT_CONTEXT_TOKEN_BUDGET.
+
+    A live chat object accumulates turns, so once it holds twice the verbatim
+    window (or exceeds the budget) a background fold summarizes the overflow
+    and evicts the session's chat object; the next turn rebuilds it from the
+    summary and the most recent turns. Prompt size therefore stays within a
+    fixed band however long the visitor chats. Folding uses the LLM, and falls
+    back to a truncated transcript when the LLM is unavailable.
+    """
+
+    def __init__(self, max_turns: int, token_budget: int, summary_max_tokens: int):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self._encoding = None
+        self._encoding_loaded = False
+        self._folding: Dict[str, asyncio.Task] = {}
+        self.folds = 0
+        self.fallback_summaries = 0
+
+    def count_tokens(self, text: str) -> int:
+        """tiktoken count when the encoding is available, otherwise ~4 characters per token"""
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                logger.info(f"tiktoken unavailable ({e}); estimating prompt tokens from length")
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text) / 4)
+
+    def turn_tokens(self, turn: Dict[str, Any]) -> int:
+        return self.count_tokens(turn["user_message"]) + self.count_tokens(turn["ai_response"])
+
+    @staticmethod
+    def initial_messages(turns: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        messages = []
+        for turn in turns:
+            messages.append({"role": "user", "content": turn["user_message"]})
+            messages.append({"role": "assistant", "content": turn["ai_response"]})
+        return messages
+
+    def fit(self, summary: str, turns: List[Dict[str, Any]]) -> int:
+        """How many of the most recent turns fit verbatim beside the summary"""
+        remaining = self.token_budget - self.count_tokens(summary)
+        kept = 0
+        for turn in reversed(turns[-self.max_turns:]):
+            remaining -= self.turn_tokens(turn)
+            if remaining < 0:
+                break
+            kept += 1
+        return kept
+
+    async def _session_state(self, session_id: str) -> Dict[str, Any]:
+        session = await db.chat_sessions.find_one(
+            {"session_id": session_id}, {"_id": 0, "summary": 1, "summarized_turns": 1, "message_count": 1}
+        ) or {}
+        return {
+            "summary": session.get("summary", ""),
+            "summarized_turns": session.get("summarized_turns", 0),
+            "message_count": session.get("message_count", 0),
+        }
+
+    async def load(self, session_id: str) -> Dict[str, Any]:
+        """Summary and verbatim turns to build a session's chat object from"""
+        state = await self._session_state(session_id)
+        unsummarized = state["message_count"] - state["summarized_turns"]
+        start = max(state["summarized_turns"], state["message_count"] - 2 * self.max_turns)
+        turns = await load_turns_from(session_id, start, state["message_count"] - start)
+        kept = self.fit(state["summary"], turns)
+        if kept < unsummarized:
+            # Turns beyond the window are not in the summary yet
+            self.schedule_fold(session_id)
+        return {"summary": state["summary"], "turns": turns[len(turns) - kept:]}
+
+    def measure(self, context: Dict[str, Any]) -> Dict[str, int]:
+        return {
+            "system_tokens": chat_prompt.prompt_tokens + self.count_tokens(context.get("summary", "")),
+            "context_turns": len(context["turns"]),
+            "context_tokens": sum(self.turn_tokens(turn) for turn in context["turns"]),
+        }
+
+    def record_turn(self, session_id: str, user_message: str, ai_response: str) -> tuple:
+        """Account for a completed turn.
+
+        Returns the estimated prompt size it was sent with, and whether the
+        session is due a fold; the caller schedules that once the turn is saved,
+        so the fold sees it in message_count.
+        """
+        entry = llm_clients.peek(session_id)
+        if entry is None or "system_tokens" not in entry:
+            return None, False
+        user_tokens = self.count_tokens(user_message)
+        prompt_tokens = entry["system_tokens"] + entry["context_tokens"] + user_tokens
+        chat_prompt_tokens.observe(prompt_tokens)
+        entry["context_turns"] += 1
+        entry["context_tokens"] += user_tokens + self.count_tokens(ai_response)
+        # Mirrors what the live chat object has seen, for chats built alongside it (hedges)
+        entry["context"]["turns"].append({"user_message": user_message, "ai_response": ai_response})
+        fold_due = entry["context_turns"] >= 2 * self.max_turns or entry["context_tokens"] > self.token_budget
+        return prompt_tokens, fold_due
+
+    def schedule_fold(self, session_id: str):
+        if session_id not in self._folding:
+            task = asyncio.create_task(self.fold(session_id))
+            self._folding[session_id] = task
+            task.add_done_callback(lambda _: self._folding.pop(session_id, None))
+
+    async def fold(self, session_id: str):
+        """Fold turns that no longer fit the window into the session's summary"""
+        try:
+            state = await self._session_state(session_id)
+            # Positions, not "the last N": a turn appended meanwhile cannot shift the window
+            turns = await load_turns_from(
+                session_id, state["summarized_turns"], state["message_count"] - state["summarized_turns"]
+            )
+            to_fold = turns[:len(turns) - self.fit(state["summary"], turns)]
+            if not to_fold:
+                return
+            summary = await self.summarize(session_id, state["summary"], to_fold)
+            guard = {"summarized_turns": state["summarized_turns"]}
+            if state["summarized_turns"] == 0:
+                guard = {"$or": [guard, {"summarized_turns": {"$exists": False}}]}
+            result = await db.chat_sessions.update_one(
+                {"session_id": session_id, **guard},
+                {"$set": {
+                    "summary": summary,
+                    "summarized_turns": state["summarized_turns"] + len(to_fold),
+                    "summary_tokens": self.count_tokens(summary),
+                    "summary_updated_at": _utc_iso(),
+                }}
+            )
+            if result.modified_count:
+                self.folds += 1
+                # Rebuild from the new summary on the next turn
+                llm_clients.evict(session_id)
+        except Exception as e:
+            logger.error(f"Could not fold chat context for {session_id}: {e}")
+
+    async def summarize(self, session_id: str, summary: str, turns: List[Dict[str, Any]]) -> str:
+        transcript = "\n".join(f"Visitor: {t['user_message']}\nAssistant: {t['ai_response']}" for t in turns)
+        prompt = f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+        try:
+            async with llm_scheduler.slot():
+                chat = llm_clients.build_chat(
+                    f"{session_id}:summary",
+                    system_message=CHAT_SUMMARY_SYSTEM_MESSAGE.format(words=int(self.summary_max_tokens * 0.75))
+                )
+                return await llm_breaker.call(chat.send_message, llm_clients.user_message(prompt))
+        except Exception as e:
+            logger.warning(f"LLM summary failed for {session_id}, keeping a truncated transcript: {e}")
+            self.fallback_summaries += 1
+            combined = f"{summary}\n{transcript}".strip()
+            # Keep the most recent part, which is what the next turns are likely to build on
+            return combined[-self.summary_max_tokens * 4:]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_turns": self.max_turns,
+            "token_budget": self.token_budget,
+            "summary_max_tokens": self.summary_max_tokens,
+            "folding": len(self._folding),
+            "folds": self.folds,
+            "fallback_summaries": self.fallback_summaries,
+        }
+
+chat_context = ChatContextWindow(CHAT_CONTEXT_TURNS, CHAT_CONTEXT_TOKEN_BUDGET, CHAT_SUMMARY_MAX_TOKENS)
+
+def _bucket_turn(chat_doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: chat_doc[key] for key in ("id", "user_message", "ai_response", "created_at")}
+
+async def append_to_bucket(chat_doc: Dict[str, Any]):
+    """$push the turn into the session's open bucket, starting a new one when it is full"""
+    await db.chat_session_buckets.update_one(
+        {"session_id": chat_doc["session_id"], "count": {"$lt": CHAT_BUCKET_SIZE}},
+        {
+            "$push": {"messages": _bucket_turn(chat_doc)},
+            "$inc": {"count": 1},
+            "$set": {"last_activity_at": chat_doc["created_at"]},
+            "$setOnInsert": {"created_at": chat_doc["created_at"]},
+        },
+        upsert=True,
+    )
+
+async def load_chat_history(session_id: str) -> List[Dict[str, Any]]:
+    """All turns of a session, oldest first"""
+    if CHAT_HISTORY_STORAGE != "buckets":
+        return await db.chat_messages.find({"session_id": session_id}, {"_id": 0}).sort("created_at", 1).to_list(None)
+    buckets = await db.chat_session_buckets.find(
+        {"session_id": session_id}, {"_id": 0, "messages": 1}
+    ).sort("created_at", 1).to_list(None)
+    return [{**turn, "session_id": session_id} for bucket in buckets for turn in bucket["messages"]]
+
+async def load_turns_from(session_id: str, start: int, limit: int) -> List[Dict[str, Any]]:
+    """Up to `limit` turns of a session from position `start` (0-based), oldest first"""
+    if limit <= 0:
+        return []
+    if CHAT_HISTORY_STORAGE != "buckets":
+        cursor = db.chat_messages.find({"session_id": session_id}, {"_id": 0}).sort("created_at", ASCENDING)
+        return await cursor.skip(start).to_list(limit)
+    order = [("created_at", ASCENDING), ("_id", ASCENDING)]
+    # Bucket sizes first, so only the buckets covering the range are read in full
+    buckets = await db.chat_session_buckets.find({"session_id": session_id}, {"count": 1}).sort(order).to_list(None)
+    wanted = []
+    first_offset = offset = 0
+    for bucket in buckets:
+        if offset + bucket["count"] > start and offset < start + limit:
+            if not wanted:
+                first_offset = offset
+            wanted.append(bucket["_id"])
+        offset += bucket["count"]
+    if not wanted:
+        return []
+    docs = await db.chat_session_buckets.find({"_id": {"$in": wanted}}, {"_id": 0, "messages": 1}).sort(order).to_list(None)
+    turns = [turn for doc in docs for turn in doc["messages"]]
+    return turns[start - first_offset:start - first_offset + limit]
+
+async def migrate_chat_history() -> Dict[str, int]:
+    """Rebuild chat_session_buckets from the flat chat_messages collection.
+
+    Idempotent: each session's buckets are replaced with ones cut from its
+    messages in order. Turns written while a session is being rebuilt can be
+    lost from its buckets, so run it at a quiet moment.
+    """
+    sessions = 0
+    buckets = 0
+    current_session = None
+    pending: List[Dict[str, Any]] = []
+
+    async def flush(session_id: str, turns: List[Dict[str, Any]]) -> int:
+        docs = [
+            {
+                "session_id": session_id,
+                "count": len(chunk),
+                "messages": chunk,
+                "created_at": chunk[0]["created_at"],
+                "last_activity_at": chunk[-1]["created_at"],
+            }
+            for chunk in (turns[i:i + CHAT_BUCKET_SIZE] for i in range(0, len(turns), CHAT_BUCKET_SIZE))
+        ]
+        await db.chat_session_buckets.delete_many({"session_id": session_id})
+        await db.chat_session_buckets.insert_many(docs)
+        return len(docs)
+
+    cursor = db.chat_messages.find({}, {"_id": 0}).sort([("session_id", ASCENDING), ("created_at", ASCENDING)])
+    async for message in cursor:
+        if message["session_id"] != current_session:
+            if pending:
+                buckets += await flush(current_session, pending)
+                sessions += 1
+            current_session, pending = message["session_id"], []
+        pending.append(_bucket_turn(message))
+    if pending:
+        buckets += await flush(current_session, pending)
+        sessions += 1
+
+    logger.info(f"Migrated chat history into {buckets} bucket(s) across {sessions} session(s)")
+    return {"sessions": sessions, "buckets": buckets}
+
+async def backfill_chat_buckets():
+    """Migrate existing chat history the first time bucketed storage starts up.
+
+    Without it every session that predates the buckets would read as empty.
+    The claim in db.migrations keeps concurrently starting workers from
+    migrating twice; POST /admin/chat-history/migrate can re-run it.
+    """
+    if CHAT_HISTORY_STORAGE != "buckets":
+        return
+    if await db.chat_session_buckets.find_one({}, {"_id": 1}) or not await db.chat_messages.find_one({}, {"_id": 1}):
+        return
+    try:
+        await db.migrations.insert_one({"_id": "chat_session_buckets", "started_at": _utc_iso()})
+    except DuplicateKeyError:
+        return
+    logger.info("No chat history buckets found, backfilling from chat_messages...")
+    result = await migrate_chat_history()
+    await db.migrations.update_one(
+        {"_id": "chat_session_buckets"}, {"$set": {"completed_at": _utc_iso(), **result}}
+    )
+
+class ChatResponseCache:
+    """Bounded TTL cache of replies keyed by the normalized user prompt.
+
+    Only consulted for the first turn of a session: later turns depend on the
+    conversation so far. Cleared whenever the service catalog changes, since
+    replies quote services and prices.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        cleaned = "".join(ch if ch.isalnum() else " " for ch in text.lower())
+        return " ".join(cleaned.split())
+
+    def get(self, message: str) -> Optional[str]:
+        key = self.normalize(message)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, message: str, response: str):
+        if self.max_entries <= 0:
+            return
+        key = self.normalize(message)
+        self._entries[key] = (response, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self, *_):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
 
-async def require_admin(user: dict = Depends(get_current_user)):
-    if user.get("role") != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    return user
+chat_response_cache = ChatResponseCache(CHAT_CACHE_SIZE, CHAT_CACHE_TTL_SECONDS)
+service_catalog.subscribe(chat_response_cache.clear)
 
-# ==================== AUTH ROUTES ====================
+class ChatIntentRouter:
+    """Answers catalog questions locally instead of calling the LLM.
 
-@api_router.post("/auth/register", response_model=TokenResponse)
-async def register(user_data: UserCreate):
-    existing = await db.users.find_one({"email": user_data.email})
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    user_id = str(uuid.uuid4())
-    user_doc = {
-        "id": user_id,
-        "email": user_data.email,
-        "password": hash_password(user_data.password),
-        "name": user_data.name,
-        "role": "user",
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.users.insert_one(user_doc)
-    
-    token = create_token(user_id, user_data.email, "user")
-    return TokenResponse(
-        access_token=token,
-        token_type="bearer",
-        user=UserResponse(
-            id=user_id,
-            email=user_data.email,
-            name=user_data.name,
-            role="user",
-            created_at=user_doc["created_at"]
-        )
-    )
+    Each service is indexed as an L2-normalized TF-IDF vector over its title,
+    slug, descriptions, features and plan names; the index is rebuilt from the
+    catalog snapshot whenever the catalog changes. A message is answered from a
+    template only when it is short, carries a pricing, features or catalog cue,
+    most of its remaining words are known to the index, and (for questions
+    about one service) the best match clearly beats the runner-up. Everything
+    else returns None and goes to the LLM.
+    """
 
-@api_router.post("/auth/login", response_model=TokenResponse)
-async def login(credentials: UserLogin):
-    user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password"]):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-    
-    token = create_token(user["id"], user["email"], user["role"])
-    return TokenResponse(
-        access_token=token,
-        token_type="bearer",
-        user=UserResponse(
-            id=user["id"],
-            email=user["email"],
-            name=user["name"],
-            role=user["role"],
-            created_at=user["created_at"]
-        )
+    TOKEN_RE = re.compile(r"[a-z0-9]+")
+    STOPWORDS = frozenset({
+        "a", "an", "the", "is", "are", "was", "be", "do", "does", "did", "i", "me", "my", "we", "our",
+        "you", "your", "it", "its", "of", "for", "to", "in", "on", "with", "and", "or", "what", "whats",
+        "how", "which", "can", "could", "would", "will", "there", "this", "that", "about", "tell",
+        "please", "any", "get", "have", "has", "hi", "hello", "thanks", "us", "from", "by", "per",
+    })
+    # Checked in order; singular forms, since tokens are singularized
+    INTENT_CUES = (
+        ("pricing", frozenset({"price", "pricing", "cost", "much", "fee", "charge", "expensive", "cheap", "afford"})),
+        ("features", frozenset({"include", "included", "feature", "cover", "covered", "contain"})),
+        ("catalog", frozenset({"offer", "offering", "provide", "product", "service"})),
     )
+    CUE_WORDS = frozenset().union(*(cues for _, cues in INTENT_CUES))
+    # "What does it not include?" inverts the question; a template would answer the opposite
+    NEGATIONS = frozenset({"not", "no", "without", "except", "excluding", "dont", "don", "doesnt", "doesn", "isnt", "isn"})
+    MIN_COVERAGE = 0.6
 
-@api_router.get("/auth/me", response_model=UserResponse)
-async def get_me(user: dict = Depends(get_current_user)):
-    return UserResponse(
-        id=user["id"],
-        email=user["email"],
-        name=user["name"],
-        role=user["role"],
-        created_at=user["created_at"]
-    )
+    def __init__(self, enabled: bool, min_score: float, min_margin: float, max_words: int):
+        self.enabled = enabled
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.max_words = max_words
+        self.catalog_version = -1
+        self.services: List[Dict[str, Any]] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.idf = np.zeros(0)
+        self.matrix = np.zeros((0, 0))
+        self.messages = 0
+        self.errors = 0
+        self.routed: Dict[str, int] = {}
+        self.route_seconds = 0.0
 
-# ==================== SERVICES ROUTES ====================
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        tokens = []
+        for token in cls.TOKEN_RE.findall(text.lower()):
+            if len(token) < 2:
+                continue
+            if token not in cls.STOPWORDS and len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+                token = token[:-1]
+            tokens.append(token)
+        return tokens
 
-@api_router.get("/services", response_model=List[ServiceResponse])
-async def get_services():
-    services = await db.services.find({}, {"_id": 0}).to_list(100)
-    return services
+    @classmethod
+    def service_text(cls, service: Dict[str, Any]) -> List[str]:
+        # Title and slug count three times so naming a service outweighs shared description words
+        parts = [service["title"], service["slug"].replace("-", " ")] * 3
+        parts += [service["short_description"], service["full_description"], *service.get("features", [])]
+        parts += [plan["name"] for plan in service.get("pricing", [])] * 2
+        return [t for t in cls.tokenize(" ".join(parts)) if t not in cls.STOPWORDS]
 
-@api_router.get("/services/{slug}", response_model=ServiceResponse)
-async def get_service(slug: str):
-    service = await db.services.find_one({"slug": slug}, {"_id": 0})
-    if not service:
-        raise HTTPException(status_code=404, detail="Service not found")
-    return service
+    def rebuild(self, catalog: "ServiceCatalog"):
+        # Templates only ever see plans that parse, so rendering cannot fail on a malformed one
+        services = [
+            {**service, "pricing": [plan.model_dump() for plan in valid_plans(service)]}
+            for service in catalog.services
+        ]
+        documents = [self.service_text(service) for service in services]
+        vocabulary: Dict[str, int] = {}
+        for tokens in documents:
+            for token in tokens:
+                vocabulary.setdefault(token, len(vocabulary))
 
-@api_router.post("/services", response_model=ServiceResponse)
-async def create_service(service: ServiceCreate, admin: dict = Depends(require_admin)):
-    service_id = str(uuid.uuid4())
-    service_doc = {
-        "id": service_id,
-        **service.model_dump(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.services.insert_one(service_doc)
-    return ServiceResponse(**service_doc)
+        counts = np.zeros((len(documents), len(vocabulary)))
+        for row, tokens in enumerate(documents):
+            for token in tokens:
+                counts[row, vocabulary[token]] += 1
+        document_frequency = (counts > 0).sum(axis=0)
+        idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+        matrix = counts * idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
 
-@api_router.put("/services/{service_id}", response_model=ServiceResponse)
-async def update_service(service_id: str, updates: ServiceUpdate, admin: dict = Depends(require_admin)):
-    update_data = {k: v for k, v in updates.model_dump().items() if v is not None}
-    if not update_data:
-        raise HTTPException(status_code=400, detail="No updates provided")
-    
-    result = await db.services.update_one({"id": service_id}, {"$set": update_data})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Service not found")
-    
-    service = await db.services.find_one({"id": service_id}, {"_id": 0})
-    return ServiceResponse(**service)
+        self.services, self.vocabulary, self.idf, self.matrix = services, vocabulary, idf, matrix
+        self.catalog_version = catalog.version
 
-@api_router.delete("/services/{service_id}")
-async def delete_service(service_id: str, admin: dict = Depends(require_admin)):
-    result = await db.services.delete_one({"id": service_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Service not found")
-    return {"message": "Service deleted"}
+    def classify(self, message: str) -> Optional[tuple]:
+        """(intent, service or None) for a message the router can answer"""
+        tokens = self.tokenize(message)
+        if not tokens or len(tokens) > self.max_words or not self.services:
+            return None
+        token_set = set(tokens)
+        intent = next((name for name, cues in self.INTENT_CUES if token_set & cues), None)
+        if intent is None or token_set & self.NEGATIONS:
+            return None
 
-# ==================== CONTACT ROUTES ====================
+        content = [t for t in tokens if t not in self.STOPWORDS and t not in self.CUE_WORDS]
+        known = [t for t in content if t in self.vocabulary]
+        if not content:
+            # "How much are your services?" / "What do you offer?"; "How much is it?" is a follow-up for the LLM
+            return ("catalog", None) if intent != "features" and token_set & dict(self.INTENT_CUES)["catalog"] else None
+        if len(known) / len(content) < self.MIN_COVERAGE:
+            return None
 
-@api_router.post("/contact", response_model=ContactResponse)
-async def submit_contact(contact: ContactCreate):
-    contact_id = str(uuid.uuid4())
-    contact_doc = {
-        "id": contact_id,
-        **contact.model_dump(),
-        "status": "new",
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.contacts.insert_one(contact_doc)
-    
-    # Send email notification
-    try:
-        html_content = f"""
-        <h2>New Contact Form Submission</h2>
-        <p><strong>Name:</strong> {contact.name}</p>
-        <p><strong>Email:</strong> {contact.email}</p>
-        <p><strong>Phone:</strong> {contact.phone or 'Not provided'}</p>
-        <p><strong>Subject:</strong> {contact.subject}</p>
-        <p><strong>Message:</strong></p>
-        <p>{contact.message}</p>
-        """
-        params = {
-            "from": SENDER_EMAIL,
-            "to": [ADMIN_EMAIL],
-            "subject": f"New Contact: {contact.subject}",
-            "html": html_content
-        }
-        await asyncio.to_thread(resend.Emails.send, params)
-        logger.info(f"Contact notification email sent for {contact_id}")
-    except Exception as e:
-        logger.error(f"Failed to send contact email: {e}")
-    
-    return ContactResponse(**contact_doc)
+        query = np.zeros(len(self.vocabulary))
+        for token in known:
+            query[self.vocabulary[token]] += 1
+        query *= self.idf
+        scores = self.matrix @ (query / np.linalg.norm(query))
+        ranked = np.argsort(scores)[::-1]
+        best = scores[ranked[0]]
+        runner_up = scores[ranked[1]] if len(ranked) > 1 else 0.0
+        if best < self.min_score or best - runner_up < self.min_margin:
+            return None
+        service = self.services[ranked[0]]
+        if intent == "pricing" and not service["pricing"]:
+            return None
+        return ("overview" if intent == "catalog" else intent, service)
 
-@api_router.get("/admin/contacts", response_model=List[ContactResponse])
-async def get_contacts(admin: dict = Depends(require_admin)):
-    contacts = await db.contacts.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return contacts
+    @staticmethod
+    def starting_price(service: Dict[str, Any]) -> str:
+        plans = service.get("pricing", [])
+        if not plans:
+            return ""
+        plan = min(plans, key=lambda p: p["price"])
+        return f" (from {_format_price(plan['price'])} {_format_period(plan['period'])})"
 
-@api_router.put("/admin/contacts/{contact_id}/status")
-async def update_contact_status(contact_id: str, status: str = Body(..., embed=True), admin: dict = Depends(require_admin)):
-    result = await db.contacts.update_one({"id": contact_id}, {"$set": {"status": status}})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Contact not found")
-    return {"message": "Status updated"}
+    def render(self, intent: str, service: Optional[Dict[str, Any]]) -> str:
+        if service is None:
+            lines = [f"- {s['title']}{self.starting_price(s)}: {s['short_description']}" for s in self.services]
+            return "Guardian AI offers:\n" + "\n".join(lines) + "\n\nWhich one would you like to know more about?"
+        plans = "\n".join(
+            f"- {plan['name']}: {_format_price(plan['price'])} {_format_period(plan['period'])}"
+            for plan in service.get("pricing", [])
+        )
+        if intent == "pricing":
+            return (
+                f"{service['title']} pricing:\n{plans}\n\n"
+                "You can purchase directly from the service page, or tell me about your needs and I'll help you pick a plan."
+            )
+        features = "\n".join(f"- {feature}" for feature in service.get("features", []))
+        if intent == "overview":
+            return f"{service['title']}: {service['short_description']}\n\nIt includes:\n{features}\n\nPlans:\n{plans}"
+        return f"{service['title']} includes:\n{features}\n\nPlans:\n{plans}"
 
-# ==================== CHAT ROUTES ====================
+    def answer(self, session_id: str, message: str) -> Optional[str]:
+        """Template reply for a catalog question, or None to use the LLM"""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        self.messages += 1
+        try:
+            routed = self.classify(message)
+            if routed is None:
+                return None
+            intent, service = routed
+            reply = self.render(intent, service)
+            self.routed[intent] = self.routed.get(intent, 0) + 1
+        except Exception as e:
+            # The router is only a shortcut; the LLM can still answer
+            logger.error(f"Chat router failed, falling back to the LLM: {e}")
+            self.errors += 1
+            return None
+        finally:
+            self.route_seconds += time.perf_counter() - started
+        # A live chat object would not know about this turn; rebuild it from history next time
+        llm_clients.evict(session_id)
+        return reply
+
+    def stats(self) -> Dict[str, Any]:
+        routed = sum(self.routed.values())
+        return {
+            "enabled": self.enabled,
+            "catalog_version": self.catalog_version,
+            "services": len(self.services),
+            "vocabulary": len(self.vocabulary),
+            "messages": self.messages,
+            "routed": routed,
+            "routed_by_intent": dict(self.routed),
+            "errors": self.errors,
+            "deflection_rate": round(routed / self.messages, 4) if self.messages else 0.0,
+            "mean_route_us": round(self.route_seconds / self.messages * 1e6, 1) if self.messages else 0.0,
+        }
+
+chat_router = ChatIntentRouter(CHAT_ROUTER_ENABLED, CHAT_ROUTER_MIN_SCORE, CHAT_ROUTER_MIN_MARGIN, CHAT_ROUTER_MAX_WORDS)
+service_catalog.subscribe(chat_router.rebuild)
+
+async def is_first_turn(session_id: str) -> bool:
+    return await db.chat_sessions.find_one({"session_id": session_id}, {"_id": 1}) is None
 
 @api_router.post("/chat", response_model=ChatMessageResponse)
 async def send_chat_message(chat_data: ChatMessageCreate):
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
-    
-    chat_id = str(uuid.uuid4())
-    
-    try:
-        api_key = os.environ.get('EMERGENT_LLM_KEY')
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=chat_data.session_id,
-            system_message="""You are Guardian AI's intelligent assistant, specializing in cybersecurity and AI business solutions. 
-            You help visitors understand our services:
-            1. Data & Device Protection ($199/month) - Comprehensive security for devices and data
-            2. Cybersecurity Consultation ($299/session or $499 full audit) - Expert analysis and recommendations
-            3. Automated AI Solutions ($499/project or $99/month) - Custom AI automation for businesses
-            
-            Be professional, helpful, and knowledgeable. Guide users to appropriate services based on their needs.
-            Keep responses concise but informative."""
-        ).with_model("openai", "gpt-5.1")
-        
-        user_message = UserMessage(text=chat_data.message)
-        ai_response = await chat.send_message(user_message)
-        
-    except Exception as e:
-        logger.error(f"Chat error: {e}")
-        ai_response = "I apologize, but I'm experiencing technical difficulties. Please try again or contact us directly for assistance."
-    
-    chat_doc = {
-        "id": chat_id,
-        "session_id": chat_data.session_id,
-        "user_message": chat_data.message,
-        "ai_response": ai_response,
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.chat_messages.insert_one(chat_doc)
+    ai_response = chat_router.answer(chat_data.session_id, chat_data.message)
+    cacheable = ai_response is None and await is_first_turn(chat_data.session_id)
+    if cacheable:
+        ai_response = chat_response_cache.get(chat_data.message)
+    prompt_tokens, fold_due = None, False
+
+    if ai_response is None:
+        async with llm_scheduler.slot():
+            try:
+                async with llm_clients.session(chat_data.session_id) as chat:
+                    user_message = llm_clients.user_message(chat_data.message)
+                    ai_response = await llm_hedger.send(chat_data.session_id, chat, user_message)
+                prompt_tokens, fold_due = chat_context.record_turn(chat_data.session_id, chat_data.message, ai_response)
+                if cacheable:
+                    chat_response_cache.put(chat_data.message, ai_response)
+
+            except Exception as e:
+                logger.error(f"Chat error: {e}")
+                ai_response = CHAT_FALLBACK_RESPONSE
+                # The chat object may hold this turn half-done, and never sees the fallback
+                llm_clients.evict(chat_data.session_id)
     
+    chat_doc = await save_chat_turn(chat_data.session_id, chat_data.message, ai_response, prompt_tokens)
+    if fold_due:
+        chat_context.schedule_fold(chat_data.session_id)
     return ChatMessageResponse(**chat_doc)
 
 @api_router.get("/chat/{session_id}", response_model=List[ChatMessageResponse])
 async def get_chat_history(session_id: str):
-    messages = await db.chat_messages.find({"session_id": session_id}, {"_id": 0}).sort("created_at", 1).to_list(100)
-    return messages
+    return await load_chat_history(session_id)
+
+CHAT_SUMMARY_PROJECTION = {"_id": 0, "id": 1, "session_id": 1, "user_message": 1, "created_at": 1}
 
 @api_router.get("/admin/chat-analytics")
 async def get_chat_analytics(admin: dict = Depends(require_admin)):
-    total_messages = await db.chat_messages.count_documents({})
-    unique_sessions = len(await db.chat_messages.distinct("session_id"))
-    recent_messages = await db.chat_messages.find({}, {"_id": 0}).sort("created_at", -1).to_list(20)
+    stats = await get_stats()
+    total_messages = stats["total_chat_messages"]
+    unique_sessions = stats["total_chat_sessions"]
+    recent, next_cursor = await paginate(db.chat_messages, {}, CHAT_SUMMARY_PROJECTION, ADMIN_PAGE_SIZE, None)
     
     return {
         "total_messages": total_messages,
         "unique_sessions": unique_sessions,
-        "recent_messages": recent_messages
+        "recent_messages": [chat_message_summary(doc) for doc in recent],
+        "recent_messages_cursor": next_cursor
     }
 
+@api_router.post("/admin/chat-history/migrate")
+async def migrate_chat_history_buckets(admin: dict = Depends(require_admin)):
+    """Backfill bucketed chat history from chat_messages"""
+    return await migrate_chat_history()
+
+@api_router.get("/admin/chat-messages", response_model=ChatMessagePage)
+async def get_chat_messages(
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    admin: dict = Depends(require_admin)
+):
+    query = date_range_filter(created_after, created_before)
+    if session_id:
+        query["session_id"] = session_id
+    docs, next_cursor = await paginate(db.chat_messages, query, CHAT_SUMMARY_PROJECTION, limit, cursor)
+    return ChatMessagePage(items=[chat_message_summary(doc) for doc in docs], next_cursor=next_cursor)
+
+@api_router.get("/admin/chat-messages/{message_id}", response_model=ChatMessageResponse)
+async def get_chat_message(message_id: str, admin: dict = Depends(require_admin)):
+    message = await db.chat_messages.find_one({"id": message_id}, {"_id": 0})
+    if not message:
+        raise HTTPException(status_code=404, detail="Chat message not found")
+    return message
+
 # ==================== PAYMENT ROUTES ====================
 
-PRICING_CONFIG = {
-    "data-protection-monthly": {"amount": 199.00, "name": "Data & Device Protection - Monthly"},
-    "consultation-session": {"amount": 299.00, "name": "Cybersecurity Consultation - Session"},
-    "consultation-audit": {"amount": 499.00, "name": "Cybersecurity Consultation - Full Audit"},
-    "ai-solutions-project": {"amount": 499.00, "name": "AI Solutions - Per Project"},
-    "ai-solutions-monthly": {"amount": 99.00, "name": "AI Solutions - Monthly Subscription"},
-}
+class PricingIndex:
+    """pricing_id -> price, plan name and owning service, derived from the catalog.
+
+    Rebuilt through service_catalog.subscribe, so it follows admin edits in this
+    worker immediately and in other workers once they pick up the new catalog
+    version. Checkout validates against it without a database round trip, and
+    charges exactly what the services pages show.
+    """
+
+    def __init__(self):
+        self.catalog_version = -1
+        self.plans: Dict[str, Dict[str, Any]] = {}
+        self.duplicates: List[str] = []
+
+    def rebuild(self, catalog: "ServiceCatalog"):
+        plans: Dict[str, Dict[str, Any]] = {}
+        duplicates = []
+        for service in catalog.services:
+            for plan in valid_plans(service):
+                if plan.id in plans:
+                    duplicates.append(plan.id)
+                    logger.error(f"Pricing id {plan.id} is used by more than one service; checkout keeps the first")
+                    continue
+                plans[plan.id] = {
+                    "amount": plan.price,
+                    "name": f"{service['title']} - {plan.name}",
+                    "service_id": service["id"],
+                }
+        self.plans = plans
+        self.duplicates = duplicates
+        self.catalog_version = catalog.version
+
+    def resolve(self, service_id: str, pricing_id: str) -> Dict[str, Any]:
+        pricing = self.plans.get(pricing_id)
+        if pricing is None:
+            raise HTTPException(status_code=400, detail="Invalid pricing option")
+        if pricing["service_id"] != service_id:
+            raise HTTPException(status_code=400, detail="Pricing option does not belong to this service")
+        return pricing
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "catalog_version": self.catalog_version,
+            "plans": self.plans,
+            "duplicates": self.duplicates,
+        }
+
+pricing_index = PricingIndex()
+service_catalog.subscribe(pricing_index.rebuild)
 
 @api_router.post("/payments/checkout")
-async def create_checkout(request: CheckoutRequest, http_request: Request):
+async def create_checkout(
+    request: CheckoutRequest,
+    http_request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    return await idempotency.run(
+        "checkout", idempotency_key, request, lambda: create_checkout_session(request, http_request), response
+    )
+
+async def create_checkout_session(request: CheckoutRequest, http_request: Request) -> Dict[str, str]:
     from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionRequest
     
     pricing_id = request.pricing_id
-    if pricing_id not in PRICING_CONFIG:
-        raise HTTPException(status_code=400, detail="Invalid pricing option")
-    
-    pricing = PRICING_CONFIG[pricing_id]
+    await service_catalog.ensure_loaded()
+    pricing = pricing_index.resolve(request.service_id, pricing_id)
     
     api_key = os.environ.get('STRIPE_API_KEY')
     host_url = request.origin_url.rstrip('/')
@@ -423,7 +2845,16 @@ async def create_checkout(request: CheckoutRequest, http_request: Request):
         }
     )
     
-    session = await stripe_checkout.create_checkout_session(checkout_request)
+    try:
+        session = await stripe_breaker.call(stripe_checkout.create_checkout_session, checkout_request)
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Payments are temporarily unavailable, please try again shortly",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Payment provider timed out")
     
     # Create payment transaction record
     transaction_id = str(uuid.uuid4())
@@ -439,24 +2870,58 @@ async def create_checkout(request: CheckoutRequest, http_request: Request):
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.payment_transactions.insert_one(transaction_doc)
+    await inc_stats(total_payments=1)
     
     return {"checkout_url": session.url, "session_id": session.session_id}
 
+# States after which Stripe will not report anything new for a checkout session.
+# A "complete" session can still be "unpaid" while a delayed payment method settles.
+TERMINAL_PAYMENT_STATUSES = {"paid", "no_payment_required"}
+TERMINAL_CHECKOUT_STATUSES = {"expired"}
+
+def is_terminal_payment(transaction: Dict[str, Any]) -> bool:
+    return (
+        transaction.get("payment_status") in TERMINAL_PAYMENT_STATUSES
+        or transaction.get("status") in TERMINAL_CHECKOUT_STATUSES
+    )
+
+_stripe_status_client = None
+
+def stripe_status_client():
+    """Shared StripeCheckout for status lookups (no webhook URL needed)"""
+    global _stripe_status_client
+    if _stripe_status_client is None:
+        from emergentintegrations.payments.stripe.checkout import StripeCheckout
+        _stripe_status_client = StripeCheckout(api_key=os.environ.get('STRIPE_API_KEY'), webhook_url="")
+    return _stripe_status_client
+
+async def refresh_payment_status(session_id: str):
+    status = await stripe_breaker.call(stripe_status_client().get_checkout_status, session_id)
+    await record_payment_status(session_id, status.payment_status, status.status)
+    return status
+
+def _stale_before(seconds: float) -> str:
+    return _utc_iso(-seconds)
+
 @api_router.get("/payments/status/{session_id}")
 async def get_payment_status(session_id: str):
-    from emergentintegrations.payments.stripe.checkout import StripeCheckout
-    
-    api_key = os.environ.get('STRIPE_API_KEY')
-    stripe_checkout = StripeCheckout(api_key=api_key, webhook_url="")
-    
-    try:
-        status = await stripe_checkout.get_checkout_status(session_id)
-        
-        # Update transaction in database
-        await db.payment_transactions.update_one(
-            {"session_id": session_id},
-            {"$set": {"payment_status": status.payment_status, "status": status.status}}
+    transaction = await db.payment_transactions.find_one({"session_id": session_id}, {"_id": 0})
+
+    # Terminal or recently refreshed transactions are answered locally; the
+    # webhook and the reconciler keep them current
+    if transaction and (
+        is_terminal_payment(transaction)
+        or transaction.get("status_checked_at", "") > _stale_before(PAYMENT_STATUS_MIN_REFRESH_SECONDS)
+    ):
+        return PaymentStatusResponse(
+            status=transaction.get("status", "open"),
+            payment_status=transaction["payment_status"],
+            amount=transaction["amount"],
+            currency=transaction["currency"]
         )
+
+    try:
+        status = await refresh_payment_status(session_id)
         
         return PaymentStatusResponse(
             status=status.status,
@@ -466,10 +2931,298 @@ async def get_payment_status(session_id: str):
         )
     except Exception as e:
         logger.error(f"Payment status error: {e}")
+        if transaction:
+            # Stripe is slow or down: answer with the last status we recorded
+            return PaymentStatusResponse(
+                status=transaction.get("status", "open"),
+                payment_status=transaction["payment_status"],
+                amount=transaction["amount"],
+                currency=transaction["currency"]
+            )
         raise HTTPException(status_code=400, detail="Failed to get payment status")
 
+class PaymentStatusBroker:
+    """In-process pub/sub that wakes long-poll waiters when a session settles.
+
+    record_payment_status publishes locally. Settlements recorded by another
+    worker arrive through a MongoDB change stream when the deployment is a
+    replica set; otherwise a single loop polls all waited-on sessions with one
+    query every PAYMENT_WAIT_POLL_SECONDS.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self.change_stream_active = False
+        self.published = 0
+
+    def publish(self, session_id: str):
+        self.published += 1
+        for future in self._waiters.pop(session_id, []):
+            if not future.done():
+                future.set_result(True)
+
+    @contextmanager
+    def subscribe(self, session_id: str):
+        """Register a waiter up front; subscribe before reading the status so a
+        publish between the read and the wait is not missed"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(session_id, []).append(future)
+        try:
+            yield future
+        finally:
+            waiters = self._waiters.get(session_id)
+            if waiters and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._waiters[session_id]
+
+    @staticmethod
+    async def settled(future: asyncio.Future, timeout: float) -> bool:
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    async def wait(self, session_id: str, timeout: float) -> bool:
+        with self.subscribe(session_id) as future:
+            return await self.settled(future, timeout)
+
+    async def run(self):
+        try:
+            await self._watch_changes()
+        except OperationFailure as e:
+            # Standalone mongod: change streams need a replica set
+            logger.info(f"Payment change stream unavailable ({e}); polling for cross-worker updates")
+        except Exception as e:
+            logger.warning(f"Payment change stream stopped ({e}); polling for cross-worker updates")
+        self.change_stream_active = False
+        await self._poll()
+
+    async def _watch_changes(self):
+        pipeline = [{"$match": {
+            "operationType": "update",
+            "$or": [
+                {"updateDescription.updatedFields.payment_status": {"$in": list(TERMINAL_PAYMENT_STATUSES)}},
+                {"updateDescription.updatedFields.status": {"$in": list(TERMINAL_CHECKOUT_STATUSES)}},
+            ],
+        }}]
+        async with db.payment_transactions.watch(pipeline, full_document="updateLookup") as stream:
+            self.change_stream_active = True
+            async for change in stream:
+                session_id = (change.get("fullDocument") or {}).get("session_id")
+                if session_id in self._waiters:
+                    self.publish(session_id)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(PAYMENT_WAIT_POLL_SECONDS)
+            if not self._waiters:
+                continue
+            try:
+                settled = await db.payment_transactions.find(
+                    {
+                        "session_id": {"$in": list(self._waiters)},
+                        "$or": [
+                            {"payment_status": {"$in": list(TERMINAL_PAYMENT_STATUSES)}},
+                            {"status": {"$in": list(TERMINAL_CHECKOUT_STATUSES)}},
+                        ],
+                    },
+                    {"_id": 0, "session_id": 1}
+                ).to_list(None)
+                for transaction in settled:
+                    self.publish(transaction["session_id"])
+            except Exception as e:
+                logger.error(f"Payment status poll failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "waiting_sessions": len(self._waiters),
+            "waiters": sum(len(waiters) for waiters in self._waiters.values()),
+            "published": self.published,
+            "change_stream_active": self.change_stream_active,
+        }
+
+payment_status_broker = PaymentStatusBroker()
+
+@api_router.get("/payments/status/{session_id}/wait", response_model=PaymentStatusResponse)
+async def wait_for_payment_status(session_id: str, timeout: float = Query(PAYMENT_WAIT_MAX_SECONDS, gt=0)):
+    """Long-poll: respond as soon as the session settles, or with the current status after `timeout` seconds"""
+    with payment_status_broker.subscribe(session_id) as settled:
+        current = await get_payment_status(session_id)
+        if is_terminal_payment(current.model_dump()):
+            return current
+        await payment_status_broker.settled(settled, min(timeout, PAYMENT_WAIT_MAX_SECONDS))
+
+    transaction = await db.payment_transactions.find_one({"session_id": session_id}, {"_id": 0})
+    if not transaction:
+        return current
+    return PaymentStatusResponse(
+        status=transaction.get("status", current.status),
+        payment_status=transaction["payment_status"],
+        amount=transaction["amount"],
+        currency=transaction["currency"]
+    )
+
+class PaymentReconciler:
+    """Periodically refreshes pending transactions whose status has gone stale.
+
+    Each transaction is claimed by advancing status_checked_at with a
+    conditional update, so several API workers can sweep without issuing
+    duplicate Stripe lookups.
+    """
+
+    def __init__(self):
+        self._semaphore = asyncio.Semaphore(PAYMENT_SWEEP_CONCURRENCY)
+        self.swept = 0
+        self.errors = 0
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(PAYMENT_SWEEP_INTERVAL_SECONDS)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Payment reconciliation failed: {e}")
+
+    async def sweep(self) -> int:
+        stale_before = _stale_before(PAYMENT_SWEEP_STALE_SECONDS)
+        candidates = await db.payment_transactions.find(
+            {
+                "payment_status": {"$nin": list(TERMINAL_PAYMENT_STATUSES)},
+                "status": {"$nin": list(TERMINAL_CHECKOUT_STATUSES)},
+                "created_at": {"$gte": _stale_before(PAYMENT_SWEEP_MAX_AGE_HOURS * 3600)},
+                "$or": [
+                    {"status_checked_at": {"$exists": False}},
+                    {"status_checked_at": {"$lte": stale_before}},
+                ],
+            },
+            {"_id": 0, "session_id": 1, "status_checked_at": 1}
+        ).to_list(PAYMENT_SWEEP_BATCH)
+
+        results = await asyncio.gather(*(self._reconcile(candidate) for candidate in candidates))
+        refreshed = sum(results)
+        if refreshed:
+            logger.info(f"Reconciled {refreshed} pending payment(s)")
+        return refreshed
+
+    async def _reconcile(self, candidate: Dict[str, Any]) -> bool:
+        claim = await db.payment_transactions.update_one(
+            {"session_id": candidate["session_id"], "status_checked_at": candidate.get("status_checked_at")},
+            {"$set": {"status_checked_at": _utc_iso()}}
+        )
+        if claim.modified_count == 0:
+            return False
+        async with self._semaphore:
+            try:
+                await refresh_payment_status(candidate["session_id"])
+                self.swept += 1
+                return True
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Could not reconcile payment {candidate['session_id']}: {e}")
+                return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"swept": self.swept, "errors": self.errors}
+
+payment_reconciler = PaymentReconciler()
+
+class WebhookEventConsumer:
+    """Applies queued Stripe events from db.webhook_events to payment_transactions.
+
+    The webhook route only verifies and stores each event, so Stripe gets its
+    200 regardless of how slow processing is. Events are claimed with a lease
+    like the email outbox; failures back off exponentially and are
+    dead-lettered as 'dead' after WEBHOOK_MAX_ATTEMPTS.
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self.applied = 0
+        self.retried = 0
+        self.dead_lettered = 0
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def run(self):
+        while True:
+            try:
+                event = await self._claim()
+                if event:
+                    await self._process(event)
+            except Exception as e:
+                # A claimed event that was not recorded is picked up again once its lease expires
+                logger.error(f"Webhook consumer error: {e}")
+                event = None
+            if event:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), WEBHOOK_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = _utc_iso()
+        return await db.webhook_events.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "processing", "lease_until": {"$lte": now}},
+            ]},
+            {"$set": {"status": "processing", "lease_until": _utc_iso(WEBHOOK_LEASE_SECONDS)}},
+            sort=[("next_attempt_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _apply(self, event: Dict[str, Any]):
+        session_id = event.get("session_id")
+        if event.get("payment_status") == "paid":
+            if await record_payment_status(session_id, "paid", "complete") is None:
+                # The checkout insert may not be visible yet; retry rather than drop the event
+                raise LookupError(f"No transaction for session {session_id}")
+            logger.info(f"Payment completed for session {session_id}")
+        elif event.get("event_type") == "checkout.session.expired":
+            await record_payment_status(session_id, event.get("payment_status") or "unpaid", "expired")
+
+    async def _process(self, event: Dict[str, Any]):
+        attempts = event.get("attempts", 0) + 1
+        try:
+            await self._apply(event)
+        except Exception as e:
+            if attempts >= WEBHOOK_MAX_ATTEMPTS:
+                update = {"status": "dead"}
+                self.dead_lettered += 1
+                logger.error(f"Dead-lettering webhook event {event['event_id']} after {attempts} attempts: {e}")
+            else:
+                delay = min(WEBHOOK_BACKOFF_SECONDS * 2 ** (attempts - 1), 3600)
+                update = {"status": "pending", "next_attempt_at": _utc_iso(delay)}
+                self.retried += 1
+                asyncio.get_running_loop().call_later(delay, self.wake)
+                logger.warning(f"Webhook event {event['event_id']} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+            await db.webhook_events.update_one(
+                {"event_id": event["event_id"]},
+                {"$set": {**update, "attempts": attempts, "last_error": str(e)}, "$unset": {"lease_until": ""}}
+            )
+            return
+
+        await db.webhook_events.update_one(
+            {"event_id": event["event_id"]},
+            {"$set": {"status": "processed", "attempts": attempts, "processed_at": _utc_iso()}, "$unset": {"lease_until": ""}}
+        )
+        self.applied += 1
+
+    async def stats(self) -> Dict[str, Any]:
+        counts = {}
+        async for group in db.webhook_events.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[group["_id"]] = group["count"]
+        return {"by_status": counts, "applied": self.applied, "retried": self.retried, "dead_lettered": self.dead_lettered}
+
+webhook_consumer = WebhookEventConsumer()
+
 @api_router.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
+    """Verify and enqueue a Stripe event; processing happens in webhook_consumer"""
     from emergentintegrations.payments.stripe.checkout import StripeCheckout
     
     body = await request.body()
@@ -480,47 +3233,71 @@ async def stripe_webhook(request: Request):
     
     try:
         webhook_response = await stripe_checkout.handle_webhook(body, signature)
-        
-        if webhook_response.payment_status == "paid":
-            await db.payment_transactions.update_one(
-                {"session_id": webhook_response.session_id},
-                {"$set": {"payment_status": "paid", "status": "complete"}}
-            )
-            logger.info(f"Payment completed for session {webhook_response.session_id}")
-        
-        return {"status": "received"}
     except Exception as e:
-        logger.error(f"Webhook error: {e}")
-        return {"status": "error"}
+        logger.error(f"Webhook verification failed: {e}")
+        raise HTTPException(status_code=400, detail="Invalid webhook")
+
+    now = _utc_iso()
+    event_id = webhook_response.event_id or hashlib.sha256(body).hexdigest()
+    try:
+        await db.webhook_events.insert_one({
+            "event_id": event_id,
+            "event_type": webhook_response.event_type,
+            "session_id": webhook_response.session_id,
+            "payment_status": webhook_response.payment_status,
+            "payload": body.decode("utf-8", errors="replace"),
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "received_at": now
+        })
+    except DuplicateKeyError:
+        return {"status": "duplicate"}
+
+    webhook_consumer.wake()
+    return {"status": "received"}
 
-@api_router.get("/admin/payments", response_model=List[dict])
-async def get_payments(admin: dict = Depends(require_admin)):
-    payments = await db.payment_transactions.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return payments
+@api_router.get("/admin/payments", response_model=PaymentPage)
+async def get_payments(
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    admin: dict = Depends(require_admin)
+):
+    query = date_range_filter(created_after, created_before)
+    if payment_status:
+        query["payment_status"] = payment_status
+    projection = {"_id": 0, **{field: 1 for field in PaymentSummary.model_fields}}
+    items, next_cursor = await paginate(db.payment_transactions, query, projection, limit, cursor)
+    return PaymentPage(items=items, next_cursor=next_cursor)
+
+@api_router.get("/admin/payments/{transaction_id}", response_model=dict)
+async def get_payment(transaction_id: str, admin: dict = Depends(require_admin)):
+    payment = await db.payment_transactions.find_one({"id": transaction_id}, {"_id": 0})
+    if not payment:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    return payment
 
 # ==================== ADMIN DASHBOARD ====================
 
 @api_router.get("/admin/dashboard")
 async def get_dashboard_stats(admin: dict = Depends(require_admin)):
-    total_contacts = await db.contacts.count_documents({})
-    new_contacts = await db.contacts.count_documents({"status": "new"})
-    total_chat_sessions = len(await db.chat_messages.distinct("session_id"))
-    total_payments = await db.payment_transactions.count_documents({})
-    successful_payments = await db.payment_transactions.count_documents({"payment_status": "paid"})
-    
-    # Revenue calculation
-    paid_transactions = await db.payment_transactions.find({"payment_status": "paid"}, {"_id": 0, "amount": 1}).to_list(1000)
-    total_revenue = sum(t.get("amount", 0) for t in paid_transactions)
-    
+    stats = await get_stats()
     return {
-        "total_contacts": total_contacts,
-        "new_contacts": new_contacts,
-        "total_chat_sessions": total_chat_sessions,
-        "total_payments": total_payments,
-        "successful_payments": successful_payments,
-        "total_revenue": total_revenue
+        "total_contacts": stats["total_contacts"],
+        "new_contacts": stats["new_contacts"],
+        "total_chat_sessions": stats["total_chat_sessions"],
+        "total_payments": stats["total_payments"],
+        "successful_payments": stats["successful_payments"],
+        "total_revenue": stats["total_revenue"]
     }
 
+@api_router.post("/admin/stats/rebuild")
+async def rebuild_dashboard_stats(admin: dict = Depends(require_admin)):
+    return await rebuild_stats()
+
 # ==================== SEED DEFAULT SERVICES ====================
 
 @api_router.post("/seed-services")
@@ -601,6 +3378,7 @@ async def seed_services():
     ]
     
     await db.services.insert_many(default_services)
+    await service_catalog.bump()
     return {"message": "Default services created", "count": len(default_services)}
 
 # ==================== CREATE DEFAULT ADMIN ====================
@@ -615,7 +3393,7 @@ async def seed_admin():
     admin_doc = {
         "id": admin_id,
         "email": "admin@guardianai.com",
-        "password": hash_password("admin123"),
+        "password": await password_hasher.hash("admin123"),
         "name": "Admin",
         "role": "admin",
         "created_at": datetime.now(timezone.utc).isoformat()
@@ -623,6 +3401,71 @@ async def seed_admin():
     await db.users.insert_one(admin_doc)
     return {"message": "Admin created", "email": "admin@guardianai.com", "password": "admin123"}
 
+# ==================== ADMIN DIAGNOSTICS ====================
+
+@api_router.get("/admin/indexes")
+async def get_index_report(refresh: bool = False, admin: dict = Depends(require_admin)):
+    if refresh or not index_report:
+        return await ensure_indexes()
+    return index_report
+
+@api_router.get("/admin/llm")
+async def get_llm_stats(admin: dict = Depends(require_admin)):
+    return {
+        "sessions": llm_clients.stats(),
+        "scheduler": llm_scheduler.stats(),
+        "hedging": llm_hedger.stats(),
+        "prompt": chat_prompt.stats(),
+        "context": chat_context.stats(),
+        "router": chat_router.stats(),
+        "response_cache": chat_response_cache.stats()
+    }
+
+@api_router.get("/admin/auth")
+async def get_auth_stats(admin: dict = Depends(require_admin)):
+    return {
+        "password_hasher": password_hasher.stats(),
+        "principal_cache": principal_cache.stats(),
+        "trust_token_role": AUTH_TRUST_TOKEN_ROLE
+    }
+
+@api_router.get("/admin/integrations")
+async def get_integration_stats(admin: dict = Depends(require_admin)):
+    return {name: breaker.stats() for name, breaker in circuit_breakers.items()}
+
+@api_router.get("/admin/idempotency")
+async def get_idempotency_stats(admin: dict = Depends(require_admin)):
+    return {**idempotency.stats(), "stored_keys": await db.idempotency_keys.count_documents({})}
+
+@api_router.get("/admin/payments-reconciler")
+async def get_payment_reconciler_stats(admin: dict = Depends(require_admin)):
+    return {**payment_reconciler.stats(), "status_broker": payment_status_broker.stats()}
+
+@api_router.get("/admin/pricing")
+async def get_pricing_index(admin: dict = Depends(require_admin)):
+    await service_catalog.ensure_loaded()
+    return pricing_index.stats()
+
+@api_router.get("/admin/webhook-events")
+async def get_webhook_event_stats(admin: dict = Depends(require_admin)):
+    return await webhook_consumer.stats()
+
+@api_router.post("/admin/webhook-events/{event_id}/retry")
+async def retry_webhook_event(event_id: str, admin: dict = Depends(require_admin)):
+    """Requeue a dead-lettered webhook event"""
+    result = await db.webhook_events.update_one(
+        {"event_id": event_id, "status": "dead"},
+        {"$set": {"status": "pending", "attempts": 0, "next_attempt_at": _utc_iso()}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Dead-lettered event not found")
+    webhook_consumer.wake()
+    return {"message": "Event requeued"}
+
+@api_router.get("/admin/email-outbox")
+async def get_email_outbox_stats(admin: dict = Depends(require_admin)):
+    return await email_outbox.stats()
+
 # ==================== ROOT ROUTES ====================
 
 @api_router.get("/")
@@ -633,9 +3476,18 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus text exposition of request, MongoDB and integration metrics"""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Include router
 app.include_router(api_router)
 
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -644,10 +3496,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Long-running workers started at startup and cancelled at shutdown
+background_tasks: List[asyncio.Task] = []
+
 @app.on_event("startup")
 async def startup_event():
     """Auto-seed services and admin on startup if database is empty"""
     try:
+        await ensure_indexes()
+
         # Check if services exist, if not, seed them
         services_count = await db.services.count_documents({})
         if services_count == 0:
@@ -723,6 +3580,7 @@ async def startup_event():
                 }
             ]
             await db.services.insert_many(default_services)
+            await service_catalog.bump()
             logger.info("Default services seeded successfully")
         
         # Check if admin exists, if not, seed admin
@@ -733,7 +3591,7 @@ async def startup_event():
             admin_doc = {
                 "id": admin_id,
                 "email": "admin@guardianai.com",
-                "password": hash_password("admin123"),
+                "password": await password_hasher.hash("admin123"),
                 "name": "Admin",
                 "role": "admin",
                 "created_at": datetime.now(timezone.utc).isoformat()
@@ -741,10 +3599,30 @@ async def startup_event():
             await db.users.insert_one(admin_doc)
             logger.info("Default admin seeded successfully")
         
+        await service_catalog.ensure_loaded()
+        await backfill_chat_buckets()
+
+        if not await db.stats.find_one({"_id": STATS_ID}, {"_id": 1}):
+            logger.info("No dashboard stats rollup found, rebuilding from raw collections...")
+            await rebuild_stats()
+
         logger.info("Guardian AI API started successfully")
     except Exception as e:
         logger.error(f"Startup error: {e}")
 
+    background_tasks.append(asyncio.create_task(service_catalog.watch()))
+    email_outbox.start()
+    background_tasks.append(asyncio.create_task(payment_reconciler.run()))
+    background_tasks.append(asyncio.create_task(payment_status_broker.run()))
+    background_tasks.append(asyncio.create_task(webhook_consumer.run()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await email_outbox.stop()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    llm_clients.clear()
+    password_hasher.shutdown()
     client.close()
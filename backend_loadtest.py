@@ -0,0 +1,426 @@
+"""Offline load test for the Guardian AI API.
+
+Boots backend/server.py in-process behind an ASGI transport, with local
+stand-ins for everything external:
+
+* MongoDB: a local mongod via --mongo-url, or an in-memory Motor fake
+  (mongomock-motor, pinned in backend/requirements.txt)
+* LlmChat / StripeCheckout (emergentintegrations) and resend: fakes that
+  sleep for a configurable latency before answering. The primary chat model
+  can be given a slow tail (--llm-slow-fraction) and the hedge model its own
+  latency, to measure LLM hedging (--hedge) against a run without it
+
+It drives a weighted mix of catalog reads, chat, contact submissions,
+checkouts and admin dashboard reads, then prints per-endpoint p50/p95/p99
+latency and requests/sec as JSON. Save a run with --output and pass it back
+with --baseline on a later commit to get p95/throughput ratios.
+
+    python backend_loadtest.py --duration 30 --concurrency 32 --llm-latency-ms 800
+    python backend_loadtest.py --mix chat=1 --llm-only-chat --llm-slow-fraction 0.05 --output no-hedge.json
+    python backend_loadtest.py --mix chat=1 --llm-only-chat --llm-slow-fraction 0.05 --hedge --baseline no-hedge.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import types
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+
+# Endpoint name -> relative weight in the traffic mix
+DEFAULT_MIX = {
+    "services_list": 35,
+    "service_detail": 20,
+    "chat": 15,
+    "contact": 10,
+    "admin_dashboard": 10,
+    "checkout": 5,
+    "payment_status": 5,
+}
+
+SERVICE_SLUGS = ["data-device-protection", "cybersecurity-consultation", "automated-ai-solutions"]
+CHAT_PROMPTS = [
+    "What services do you offer?",
+    "How much does device protection cost?",
+    "Can you help with a security audit?",
+    "Do you build AI automations for small businesses?",
+    "I think my laptop has malware, what should I do?",
+]
+
+
+def jittered(latency_ms: float, jitter: float) -> float:
+    """Latency in seconds, spread uniformly by +/- jitter (a fraction)"""
+    spread = latency_ms * jitter
+    return max(0.0, random.uniform(latency_ms - spread, latency_ms + spread)) / 1000
+
+
+def install_fake_integrations(args):
+    """Register fake emergentintegrations modules before server.py imports them"""
+
+    class UserMessage:
+        def __init__(self, text):
+            self.text = text
+
+    class LlmChat:
+        def __init__(self, api_key=None, session_id=None, system_message=None, initial_messages=None):
+            self.session_id = session_id
+            self.system_message = system_message
+            self.messages = list(initial_messages or [])
+            self.provider, self.model = "openai", "gpt-5.1"
+
+        def with_model(self, provider, model):
+            self.provider, self.model = provider, model
+            return self
+
+        def latency(self):
+            if self.model == sys.modules["server"].LLM_HEDGE_MODEL:
+                return jittered(args.llm_hedge_latency_ms, args.jitter)
+            if random.random() < args.llm_slow_fraction:
+                return jittered(args.llm_slow_latency_ms, args.jitter)
+            return jittered(args.llm_latency_ms, args.jitter)
+
+        async def send_message(self, message):
+            await asyncio.sleep(self.latency())
+            self.messages.append(message.text)
+            return f"[{self.model}] Thanks for asking about '{message.text[:40]}'. Our team can help with that."
+
+    class _Result:
+        def __init__(self, **fields):
+            self.__dict__.update(fields)
+
+    class CheckoutSessionRequest:
+        def __init__(self, **fields):
+            self.__dict__.update(fields)
+
+    class StripeCheckout:
+        sessions = {}
+
+        def __init__(self, api_key=None, webhook_url=None):
+            self.webhook_url = webhook_url
+
+        async def create_checkout_session(self, request):
+            await asyncio.sleep(jittered(args.stripe_latency_ms, args.jitter))
+            session_id = f"cs_test_{uuid.uuid4().hex[:16]}"
+            self.sessions[session_id] = int(request.amount * 100)
+            return _Result(session_id=session_id, url=f"https://checkout.stripe.test/{session_id}")
+
+        async def get_checkout_status(self, session_id):
+            await asyncio.sleep(jittered(args.stripe_latency_ms, args.jitter))
+            paid = random.random() < 0.5
+            return _Result(
+                status="complete" if paid else "open",
+                payment_status="paid" if paid else "unpaid",
+                amount_total=self.sessions.get(session_id, 0),
+                currency="usd",
+            )
+
+        async def handle_webhook(self, body, signature):
+            event = json.loads(body)
+            return _Result(
+                event_id=event.get("id"),
+                event_type=event.get("type", "checkout.session.completed"),
+                session_id=event["session_id"],
+                payment_status=event.get("payment_status", "paid"),
+            )
+
+    package = types.ModuleType("emergentintegrations")
+    package.__path__ = []
+    llm = types.ModuleType("emergentintegrations.llm")
+    llm.__path__ = []
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.LlmChat, chat.UserMessage = LlmChat, UserMessage
+    payments = types.ModuleType("emergentintegrations.payments")
+    payments.__path__ = []
+    stripe = types.ModuleType("emergentintegrations.payments.stripe")
+    stripe.__path__ = []
+    checkout = types.ModuleType("emergentintegrations.payments.stripe.checkout")
+    checkout.StripeCheckout, checkout.CheckoutSessionRequest = StripeCheckout, CheckoutSessionRequest
+    for module in (package, llm, chat, payments, stripe, checkout):
+        sys.modules[module.__name__] = module
+
+
+def load_server(args):
+    """Import backend/server.py wired to the chosen MongoDB and a fake resend"""
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://localhost:27017"
+    os.environ["DB_NAME"] = args.db_name
+    os.environ["LLM_HEDGE_ENABLED"] = "true" if args.hedge else "false"
+    if args.llm_only_chat:
+        os.environ["CHAT_CACHE_SIZE"] = "0"
+        os.environ["CHAT_ROUTER_ENABLED"] = "false"
+    if args.hedge_min_delay_seconds is not None:
+        os.environ["LLM_HEDGE_MIN_DELAY_SECONDS"] = str(args.hedge_min_delay_seconds)
+    sys.path.insert(0, str(BACKEND_DIR))
+    install_fake_integrations(args)
+
+    import server
+
+    if not args.mongo_url:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("No --mongo-url given and mongomock-motor is not installed (pip install -r backend/requirements.txt)")
+        server.db = AsyncMongoMockClient()[args.db_name]
+
+    def send_email(params):
+        time.sleep(jittered(args.resend_latency_ms, args.jitter))
+        return {"id": str(uuid.uuid4())}
+
+    server.resend.Emails.send = send_email
+    return server
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class LoadTester:
+    def __init__(self, client, args, server):
+        self.client = client
+        self.server = server
+        self.args = args
+        self.mix = args.mix
+        self.admin_headers = {}
+        self.plans = []
+        self.session_ids = []
+        self.latencies = {name: [] for name in self.mix}
+        self.statuses = {name: {} for name in self.mix}
+
+    async def setup(self):
+        response = await self.client.post("/api/auth/login", json={"email": "admin@guardianai.com", "password": "admin123"})
+        response.raise_for_status()
+        self.admin_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        # Checkout only accepts plans that belong to the given service
+        response = await self.client.get("/api/services")
+        response.raise_for_status()
+        self.plans = [(service["id"], plan["id"]) for service in response.json() for plan in service["pricing"]]
+
+    async def services_list(self):
+        return await self.client.get("/api/services")
+
+    async def service_detail(self):
+        return await self.client.get(f"/api/services/{random.choice(SERVICE_SLUGS)}")
+
+    async def chat(self):
+        # Mostly fresh sessions, like first-time visitors opening the widget
+        session_id = f"load_{random.randint(0, self.args.chat_sessions)}"
+        return await self.client.post("/api/chat", json={"message": random.choice(CHAT_PROMPTS), "session_id": session_id})
+
+    async def contact(self):
+        return await self.client.post("/api/contact", json={
+            "name": "Load Test",
+            "email": "load@example.com",
+            "subject": f"Load test {uuid.uuid4().hex[:8]}",
+            "message": "Generated by backend_loadtest.py",
+        })
+
+    async def admin_dashboard(self):
+        return await self.client.get("/api/admin/dashboard", headers=self.admin_headers)
+
+    async def checkout(self):
+        service_id, pricing_id = random.choice(self.plans)
+        response = await self.client.post("/api/payments/checkout", json={
+            "service_id": service_id,
+            "pricing_id": pricing_id,
+            "origin_url": "http://localhost:3000",
+        })
+        if response.status_code == 200:
+            self.session_ids.append(response.json()["session_id"])
+        return response
+
+    async def payment_status(self):
+        if not self.session_ids:
+            return await self.checkout()
+        return await self.client.get(f"/api/payments/status/{random.choice(self.session_ids)}")
+
+    async def worker(self, deadline, budget):
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        while time.monotonic() < deadline and budget["remaining"] > 0:
+            budget["remaining"] -= 1
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await getattr(self, name)()
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            self.latencies[name].append(time.perf_counter() - started)
+            self.statuses[name][status] = self.statuses[name].get(status, 0) + 1
+
+    async def run(self):
+        await self.setup()
+        budget = {"remaining": self.args.requests or float("inf")}
+        deadline = time.monotonic() + self.args.duration
+        started = time.perf_counter()
+        await asyncio.gather(*(self.worker(deadline, budget) for _ in range(self.args.concurrency)))
+        return self.report(time.perf_counter() - started)
+
+    def summarize(self, samples, statuses, elapsed):
+        ordered = sorted(samples)
+        return {
+            "requests": len(ordered),
+            "requests_per_second": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            "statuses": statuses,
+        }
+
+    def report(self, elapsed):
+        all_samples, all_statuses = [], {}
+        endpoints = {}
+        for name in self.mix:
+            endpoints[name] = self.summarize(self.latencies[name], self.statuses[name], elapsed)
+            all_samples.extend(self.latencies[name])
+            for status, count in self.statuses[name].items():
+                all_statuses[status] = all_statuses.get(status, 0) + count
+        return {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "elapsed_seconds": round(elapsed, 3),
+            "config": {
+                "concurrency": self.args.concurrency,
+                "duration": self.args.duration,
+                "requests": self.args.requests,
+                "mongo": "mongod" if self.args.mongo_url else "mongomock",
+                "llm_latency_ms": self.args.llm_latency_ms,
+                "llm_slow_fraction": self.args.llm_slow_fraction,
+                "llm_slow_latency_ms": self.args.llm_slow_latency_ms,
+                "llm_hedge_latency_ms": self.args.llm_hedge_latency_ms,
+                "hedge": self.args.hedge,
+                "llm_only_chat": self.args.llm_only_chat,
+                "stripe_latency_ms": self.args.stripe_latency_ms,
+                "resend_latency_ms": self.args.resend_latency_ms,
+                "jitter": self.args.jitter,
+                "mix": self.mix,
+            },
+            "total": self.summarize(all_samples, all_statuses, elapsed),
+            "endpoints": endpoints,
+            "hedging": self.server.llm_hedger.stats(),
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(result, baseline):
+    """Ratios against a previous run; p95 > 1 or throughput < 1 means slower"""
+    comparison = {}
+    for name, current in {"total": result["total"], **result["endpoints"]}.items():
+        before = baseline["total"] if name == "total" else baseline.get("endpoints", {}).get(name)
+        if not before or not before["requests"] or not current["requests"]:
+            continue
+        comparison[name] = {
+            "p95_ratio": round(current["p95_ms"] / before["p95_ms"], 3) if before["p95_ms"] else None,
+            "throughput_ratio": round(current["requests_per_second"] / before["requests_per_second"], 3)
+            if before["requests_per_second"] else None,
+        }
+    return {"baseline_commit": baseline.get("commit"), "endpoints": comparison}
+
+
+async def run_load_test(args):
+    import httpx
+
+    server = load_server(args)
+    await server.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            return await LoadTester(client, args, server).run()
+    finally:
+        await server.app.router.shutdown()
+        if args.mongo_url and args.drop_db:
+            await drop_database(args.mongo_url, args.db_name)
+
+
+async def drop_database(mongo_url, db_name):
+    """Remove the scratch database a --mongo-url run created (the server's client is closed by now)"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(mongo_url)
+    try:
+        await client.drop_database(db_name)
+    finally:
+        client.close()
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}'; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process load test for the Guardian AI API")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to run (default 20)")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = duration only)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mongo-url", default=os.environ.get("LOADTEST_MONGO_URL"),
+                        help="local mongod to use; defaults to an in-memory fake")
+    parser.add_argument("--db-name", default=None,
+                        help="database to use; by default a scratch guardian_loadtest_<hex> database, dropped afterwards")
+    parser.add_argument("--llm-latency-ms", type=float, default=600)
+    parser.add_argument("--llm-slow-fraction", type=float, default=0.0,
+                        help="fraction of primary-model calls that take --llm-slow-latency-ms instead")
+    parser.add_argument("--llm-slow-latency-ms", type=float, default=5000)
+    parser.add_argument("--llm-hedge-latency-ms", type=float, default=None,
+                        help="hedge-model latency (default: --llm-latency-ms)")
+    parser.add_argument("--llm-only-chat", action="store_true",
+                        help="disable the chat response cache and intent router so every chat turn reaches the LLM")
+    parser.add_argument("--hedge", action="store_true", help="enable LLM hedging in the server under test")
+    parser.add_argument("--hedge-min-delay-seconds", type=float, default=None,
+                        help="override LLM_HEDGE_MIN_DELAY_SECONDS")
+    parser.add_argument("--stripe-latency-ms", type=float, default=250)
+    parser.add_argument("--resend-latency-ms", type=float, default=150)
+    parser.add_argument("--jitter", type=float, default=0.3, help="+/- fraction applied to fake latencies")
+    parser.add_argument("--chat-sessions", type=int, default=1000, help="distinct chat session ids to draw from")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="endpoint weights, e.g. services_list=5,chat=1")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report from an earlier run to compare against")
+    args = parser.parse_args()
+    if args.llm_hedge_latency_ms is None:
+        args.llm_hedge_latency_ms = args.llm_latency_ms
+    # Only a database this run named itself is dropped; an explicit --db-name is left alone
+    args.drop_db = args.db_name is None
+    if args.drop_db:
+        args.db_name = f"guardian_loadtest_{uuid.uuid4().hex[:8]}"
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    result = asyncio.run(run_load_test(args))
+    if args.baseline:
+        result["comparison"] = compare(result, json.loads(Path(args.baseline).read_text()))
+
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Microbenchmarks for the per-request CPU hot spots of the Guardian AI API.
+
+Covers token issue/decode, bcrypt hashing and verification at the configured
+BCRYPT_ROUNDS, and response_model validation + serialization of the list
+payloads FastAPI returns (done the same way FastAPI's serialize_response
+does it). Each benchmark is timed with timeit: the loop count is calibrated
+with autorange(), then the best and median of several repeats are reported
+per operation.
+
+Results are compared with a stored baseline (test_reports/microbench_baseline.json
+by default); any benchmark whose best time is more than --threshold slower
+fails the run with exit code 1. Baselines are machine specific, so refresh
+them with --update-baseline when the benchmark host changes.
+
+    python backend_microbench.py                 # run and check against the baseline
+    python backend_microbench.py --update-baseline
+    python backend_microbench.py --only jwt_decode,create_token --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+DEFAULT_BASELINE = ROOT_DIR / "test_reports" / "microbench_baseline.json"
+
+
+def load_server():
+    # server.py needs these at import time but never connects while benchmarking
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "guardian_microbench")
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+    return server
+
+
+def response_serializer(response_model):
+    """validate + serialize exactly as FastAPI does for a route's response_model"""
+    from fastapi.utils import create_response_field
+
+    field = create_response_field(name="Response_microbench", type_=response_model, mode="serialization")
+
+    def serialize(content):
+        value, errors = field.validate(content, {}, loc=("response",))
+        if errors:
+            raise ValueError(errors)
+        return field.serialize(value, by_alias=True)
+
+    return serialize
+
+
+def build_benchmarks(server):
+    now = datetime.now(timezone.utc).isoformat()
+    user_id = str(uuid.uuid4())
+    token = server.create_token(user_id, "admin@guardianai.com", "admin")
+    password = "correct horse battery staple"
+    hashed = server.hash_password(password)
+
+    services = [
+        {
+            "id": str(uuid.uuid4()),
+            "title": f"Service {i}",
+            "slug": f"service-{i}",
+            "short_description": "Comprehensive security for all your devices and sensitive data.",
+            "full_description": "Enterprise-grade security for individuals and businesses. " * 6,
+            "features": [f"Feature {n}" for n in range(7)],
+            "pricing": [{"id": f"plan-{i}", "name": "Monthly Plan", "price": 199, "period": "month", "features": ["24/7 support"]}],
+            "image_url": "https://images.example.com/service.jpg",
+            "icon": "Shield",
+            "created_at": now,
+        }
+        for i in range(3)
+    ]
+    contacts = [
+        {
+            "id": str(uuid.uuid4()),
+            "name": "Jane Doe",
+            "email": "jane@example.com",
+            "phone": "+1234567890",
+            "subject": "Security audit enquiry",
+            "message": "We would like a quote for a full security audit of our office network. " * 3,
+            "status": "new",
+            "created_at": now,
+        }
+        for _ in range(server.ADMIN_PAGE_SIZE)
+    ]
+    chat_messages = [
+        {
+            "id": str(uuid.uuid4()),
+            "session_id": "session_benchmark",
+            "user_message": "How much does device protection cost?",
+            "ai_response": "Our Data & Device Protection plan is $199/month and covers up to 10 devices. " * 4,
+            "created_at": now,
+        }
+        for _ in range(100)
+    ]
+
+    serialize_services = response_serializer(List[server.ServiceResponse])
+    serialize_contacts = response_serializer(List[server.ContactResponse])
+    serialize_chat = response_serializer(List[server.ChatMessageResponse])
+
+    return {
+        "create_token": lambda: server.create_token(user_id, "admin@guardianai.com", "admin"),
+        "jwt_decode": lambda: server.jwt.decode(token, server.JWT_SECRET, algorithms=[server.JWT_ALGORITHM]),
+        "hash_password": lambda: server.hash_password(password),
+        "verify_password": lambda: server.verify_password(password, hashed),
+        "services_response_3": lambda: serialize_services(services),
+        f"contacts_response_{len(contacts)}": lambda: serialize_contacts(contacts),
+        "chat_messages_response_100": lambda: serialize_chat(chat_messages),
+    }
+
+
+def measure(fn, repeat):
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    per_op = [total / loops for total in timer.repeat(repeat=repeat, number=loops)]
+    return {
+        "loops": loops,
+        "best_us": round(min(per_op) * 1e6, 3),
+        "median_us": round(statistics.median(per_op) * 1e6, 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def check_regressions(results, baseline, threshold):
+    """Benchmarks whose best time grew by more than `threshold` (a fraction)"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("benchmarks", {}).get(name)
+        if not before:
+            continue
+        ratio = result["best_us"] / before["best_us"]
+        result["baseline_best_us"] = before["best_us"]
+        result["ratio"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for auth and serialization helpers")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (default 0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="comma-separated benchmark names to run")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run as the new baseline")
+    args = parser.parse_args()
+
+    server = load_server()
+    benchmarks = build_benchmarks(server)
+    if args.only:
+        wanted = set(args.only.split(","))
+        unknown = wanted - set(benchmarks)
+        if unknown:
+            parser.error(f"Unknown benchmark(s): {', '.join(sorted(unknown))}; choose from {', '.join(benchmarks)}")
+        benchmarks = {name: fn for name, fn in benchmarks.items() if name in wanted}
+
+    results = {}
+    for name, fn in benchmarks.items():
+        results[name] = measure(fn, args.repeat)
+        print(f"{name:<28} best {results[name]['best_us']:>12.3f} us   median {results[name]['median_us']:>12.3f} us", file=sys.stderr)
+
+    report = {
+        "commit": git_commit(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "bcrypt_rounds": server.BCRYPT_ROUNDS,
+        "benchmarks": results,
+    }
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(json.dumps(report, indent=2))
+        print(f"Baseline written to {baseline_path}", file=sys.stderr)
+        return 0
+
+    regressions = []
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get("bcrypt_rounds") != server.BCRYPT_ROUNDS:
+            print(f"Note: baseline used BCRYPT_ROUNDS={baseline.get('bcrypt_rounds')}, this run {server.BCRYPT_ROUNDS}", file=sys.stderr)
+        regressions = check_regressions(results, baseline, args.threshold)
+        report["baseline_commit"] = baseline.get("commit")
+    else:
+        print(f"No baseline at {baseline_path}; run with --update-baseline to record one", file=sys.stderr)
+
+    report["threshold"] = args.threshold
+    report["regressions"] = regressions
+    print(json.dumps(report, indent=2))
+    if regressions:
+        print(f"❌ Regressed by more than {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
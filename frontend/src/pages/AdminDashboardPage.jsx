@@ -26,6 +26,8 @@ export default function AdminDashboardPage() {
   const [stats, setStats] = useState(null);
   const [contacts, setContacts] = useState([]);
   const [payments, setPayments] = useState([]);
+  const [contactsCursor, setContactsCursor] = useState(null);
+  const [paymentsCursor, setPaymentsCursor] = useState(null);
   const [chatAnalytics, setChatAnalytics] = useState(null);
   const [loading, setLoading] = useState(true);
 
@@ -54,8 +56,10 @@ export default function AdminDashboardPage() {
       ]);
 
       setStats(statsRes.data);
-      setContacts(contactsRes.data);
-      setPayments(paymentsRes.data);
+      setContacts(contactsRes.data.items);
+      setContactsCursor(contactsRes.data.next_cursor);
+      setPayments(paymentsRes.data.items);
+      setPaymentsCursor(paymentsRes.data.next_cursor);
       setChatAnalytics(chatRes.data);
     } catch (err) {
       toast.error('Failed to load dashboard data');
@@ -64,6 +68,20 @@ export default function AdminDashboardPage() {
     }
   };
 
+  const loadMore = async (resource, cursor, setItems, setCursor) => {
+    const token = getToken();
+    try {
+      const res = await axios.get(`${API}/admin/${resource}`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { cursor },
+      });
+      setItems((items) => [...items, ...res.data.items]);
+      setCursor(res.data.next_cursor);
+    } catch (err) {
+      toast.error(`Failed to load more ${resource}`);
+    }
+  };
+
   const updateContactStatus = async (contactId, status) => {
     const token = getToken();
     try {
@@ -229,6 +247,18 @@ export default function AdminDashboardPage() {
                       )}
                     </TableBody>
                   </Table>
+                  {contactsCursor && (
+                    <div className="flex justify-center py-4">
+                      <Button
+                        variant="outline"
+                        size="sm"
+                        onClick={() => loadMore('contacts', contactsCursor, setContacts, setContactsCursor)}
+                        data-testid="contacts-load-more"
+                      >
+                        Load more
+                      </Button>
+                    </div>
+                  )}
                 </ScrollArea>
               </CardContent>
             </Card>
@@ -279,6 +309,18 @@ export default function AdminDashboardPage() {
                         )}
                       </TableBody>
                     </Table>
+                    {paymentsCursor && (
+                      <div className="flex justify-center py-4">
+                        <Button
+                          variant="outline"
+                          size="sm"
+                          onClick={() => loadMore('payments', paymentsCursor, setPayments, setPaymentsCursor)}
+                          data-testid="payments-load-more"
+                        >
+                          Load more
+                        </Button>
+                      </div>
+                    )}
                   </ScrollArea>
                 </CardContent>
               </Card>
@@ -360,7 +402,7 @@ export default function AdminDashboardPage() {
                       {chatAnalytics?.recent_messages?.slice(0, 10).map((msg) => (
                         <div key={msg.id} className="bg-slate-800 rounded-lg p-3">
                           <p className="text-white text-sm mb-1">
-                            <span className="text-indigo-400">User:</span> {msg.user_message.substring(0, 50)}...
+                            <span className="text-indigo-400">User:</span> {msg.preview}
                           </p>
                           <p className="text-slate-400 text-xs">
                             {new Date(msg.created_at).toLocaleString()}
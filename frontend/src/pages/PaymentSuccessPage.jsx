@@ -20,10 +20,15 @@ export default function PaymentSuccessPage() {
       return;
     }
 
-    const pollPaymentStatus = async () => {
+    let cancelled = false;
+
+    // The wait endpoint holds the request open until the webhook settles the
+    // payment (or ~25s pass), so each attempt is one long-poll, not a timer tick
+    const waitForPaymentStatus = async () => {
       try {
-        const response = await axios.get(`${API}/payments/status/${sessionId}`);
-        
+        const response = await axios.get(`${API}/payments/status/${sessionId}/wait`);
+        if (cancelled) return;
+
         if (response.data.payment_status === 'paid') {
           setStatus('success');
           setPaymentDetails(response.data);
@@ -31,22 +36,24 @@ export default function PaymentSuccessPage() {
           setStatus('expired');
         } else if (attempts < 5) {
           setAttempts((prev) => prev + 1);
-          setTimeout(pollPaymentStatus, 2000);
         } else {
           setStatus('pending');
           setPaymentDetails(response.data);
         }
       } catch (err) {
+        if (cancelled) return;
         if (attempts < 5) {
-          setAttempts((prev) => prev + 1);
-          setTimeout(pollPaymentStatus, 2000);
+          setTimeout(() => !cancelled && setAttempts((prev) => prev + 1), 2000);
         } else {
           setStatus('error');
         }
       }
     };
 
-    pollPaymentStatus();
+    waitForPaymentStatus();
+    return () => {
+      cancelled = true;
+    };
   }, [sessionId, attempts]);
 
   const renderContent = () => {
@@ -0,0 +1,104 @@
+import asyncio
+import inspect
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# server.py reads these at import time; the tests never connect to MongoDB
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "guardian_tests")
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture
+def server():
+    import server
+    return server
+
+
+class FakeLlmChat:
+    """Stands in for emergentintegrations' LlmChat; records what it was built with"""
+
+    delay = 0.0
+    model_delays = {}
+    built = []
+
+    def __init__(self, api_key=None, session_id=None, system_message=None, initial_messages=None):
+        self.session_id = session_id
+        self.system_message = system_message
+        self.initial_messages = list(initial_messages or [])
+        self.sent = []
+        FakeLlmChat.built.append(self)
+
+    def with_model(self, provider, model):
+        self.provider, self.model = provider, model
+        return self
+
+    async def send_message(self, message):
+        self.sent.append(message.text)
+        await asyncio.sleep(self.model_delays.get(self.model, self.delay))
+        return f"reply to {message.text}"
+
+
+class FakeUserMessage:
+    def __init__(self, text):
+        self.text = text
+
+
+@pytest.fixture
+def fake_llm(server, monkeypatch):
+    FakeLlmChat.built = []
+    monkeypatch.setattr(FakeLlmChat, "delay", 0.0)
+    monkeypatch.setattr(FakeLlmChat, "model_delays", {})
+    monkeypatch.setattr(server.llm_clients, "_module", SimpleNamespace(LlmChat=FakeLlmChat, UserMessage=FakeUserMessage))
+    server.llm_clients.clear()
+    yield FakeLlmChat
+    server.llm_clients.clear()
+
+
+class SlowCollection:
+    """Wraps a Motor-style collection so every awaited call first yields for `latency` seconds"""
+
+    def __init__(self, collection, latency):
+        self._collection = collection
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        async def slow(*args, **kwargs):
+            await asyncio.sleep(self._latency)
+            return await attr(*args, **kwargs)
+
+        return slow
+
+
+class SlowDatabase:
+    def __init__(self, database, latency):
+        self._database = database
+        self._latency = latency
+
+    def __getattr__(self, name):
+        return SlowCollection(self._database[name], self._latency)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+@pytest.fixture
+def mock_db(server, monkeypatch):
+    """In-memory database behind server.db; pass latency= to slow every call down"""
+    def install(latency=0.0):
+        database = AsyncMongoMockClient()["guardian_tests"]
+        monkeypatch.setattr(server, "db", SlowDatabase(database, latency) if latency else database)
+        return database
+
+    return install
@@ -0,0 +1,43 @@
+import asyncio
+
+
+def run_turns(server, count):
+    async def scenario():
+        for i in range(count):
+            await server.send_chat_message(server.ChatMessageCreate(message=f"question {i}", session_id="session_1"))
+            while server.chat_context._folding:
+                await asyncio.sleep(0.005)
+
+    asyncio.run(scenario())
+
+
+def test_folds_whole_windows_with_db_latency(server, fake_llm, mock_db, monkeypatch):
+    mock_db(latency=0.005)
+    monkeypatch.setattr(server.chat_context, "max_turns", 2)
+    folded = []
+
+    async def summarize(session_id, summary, turns):
+        folded.append([turn["user_message"] for turn in turns])
+        return f"summary of {len(folded)} folds"
+
+    monkeypatch.setattr(server.chat_context, "summarize", summarize)
+    run_turns(server, 10)
+
+    assert folded == [[f"question {i}", f"question {i + 1}"] for i in range(0, 8, 2)]
+    # The last chat object was rebuilt after the third fold from its summary and the two turns since
+    chat = fake_llm.built[-1]
+    assert chat.system_message.endswith("summary of 3 folds")
+    assert [m["content"] for m in chat.initial_messages if m["role"] == "user"] == ["question 6", "question 7"]
+
+def test_turns_are_read_by_position(server, mock_db, monkeypatch):
+    mock_db()
+    monkeypatch.setattr(server, "CHAT_BUCKET_SIZE", 3)
+
+    async def scenario():
+        for i in range(8):
+            await server.save_chat_turn("session_1", f"question {i}", f"answer {i}")
+        return await server.load_turns_from("session_1", 2, 4), await server.load_turns_from("session_1", 6, 10)
+
+    middle, tail = asyncio.run(scenario())
+    assert [turn["user_message"] for turn in middle] == ["question 2", "question 3", "question 4", "question 5"]
+    assert [turn["user_message"] for turn in tail] == ["question 6", "question 7"]
@@ -0,0 +1,25 @@
+import asyncio
+
+
+def test_startup_backfills_existing_history_once(server, mock_db, monkeypatch):
+    mock_db()
+    monkeypatch.setattr(server, "CHAT_HISTORY_STORAGE", "buckets")
+
+    async def scenario():
+        for i in range(3):
+            await server.db.chat_messages.insert_one({
+                "id": f"msg-{i}",
+                "session_id": "session_1",
+                "user_message": f"question {i}",
+                "ai_response": f"answer {i}",
+                "created_at": f"2026-01-0{i + 1}T00:00:00+00:00",
+            })
+        await server.backfill_chat_buckets()
+        await server.backfill_chat_buckets()
+        history = await server.load_chat_history("session_1")
+        buckets = await server.db.chat_session_buckets.count_documents({})
+        return history, buckets
+
+    history, buckets = asyncio.run(scenario())
+    assert [turn["user_message"] for turn in history] == ["question 0", "question 1", "question 2"]
+    assert buckets == 1
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+
+def test_prompt_rebuilds_past_a_malformed_plan(server, monkeypatch):
+    cleared = []
+    monkeypatch.setattr(server.llm_clients, "clear", lambda: cleared.append(True))
+    service = {
+        "id": "svc-protection",
+        "title": "Data & Device Protection",
+        "slug": "data-device-protection",
+        "short_description": "Comprehensive security for all your devices.",
+        "features": ["Multi-device protection"],
+        "pricing": [
+            {"id": "data-protection-monthly", "name": "Monthly Plan", "price": 249, "period": "month"},
+            {"name": "Add-on", "price": 20},
+        ],
+        "created_at": "2026-01-01T00:00:00+00:00",
+    }
+    builder = server.ChatPromptBuilder(server.CHAT_SYSTEM_PREFIX)
+    builder.rebuild(SimpleNamespace(services=[service], version=4))
+
+    assert builder.catalog_version == 4
+    assert builder.prompt.startswith(server.CHAT_SYSTEM_PREFIX)
+    assert "Monthly Plan $249 per month" in builder.prompt
+    assert "Add-on" not in builder.prompt
+    assert cleared
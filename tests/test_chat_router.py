@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+SERVICES = [
+    {
+        "id": "svc-protection",
+        "title": "Data & Device Protection",
+        "slug": "data-device-protection",
+        "short_description": "Comprehensive security for all your devices and sensitive data.",
+        "full_description": "Real-time threat detection, automated backups and encryption.",
+        "features": ["Real-time threat detection and blocking", "Multi-device protection"],
+        "pricing": [
+            {"id": "data-protection-monthly", "name": "Monthly Plan", "price": 249, "period": "month"},
+            {"name": "Add-on", "price": 20},
+        ],
+    },
+    {
+        "id": "svc-ai",
+        "title": "Automated AI Solutions",
+        "slug": "automated-ai-solutions",
+        "short_description": "Custom AI automation to streamline your business operations.",
+        "full_description": "Chatbots, predictive analytics and process automation.",
+        "features": ["Intelligent chatbots", "Predictive analytics"],
+        "pricing": [{"id": "ai-solutions-monthly", "name": "Monthly Subscription", "price": 99, "period": "month"}],
+    },
+]
+
+
+def router(server):
+    chat_router = server.ChatIntentRouter(True, 0.3, 0.15, 16)
+    chat_router.rebuild(SimpleNamespace(services=SERVICES, version=1))
+    return chat_router
+
+
+def test_pricing_answer_skips_malformed_plan(server):
+    reply = router(server).answer("session_1", "How much does device protection cost?")
+    assert "$249 per month" in reply
+    assert "Add-on" not in reply
+
+
+def test_negated_question_goes_to_the_llm(server):
+    chat_router = router(server)
+    assert chat_router.classify("What does the AI solution include?") is not None
+    assert chat_router.classify("What does the AI solution not include?") is None
+
+
+def test_render_failure_falls_back_to_the_llm(server, monkeypatch):
+    chat_router = router(server)
+
+    def broken_render(intent, service):
+        raise KeyError("period")
+
+    monkeypatch.setattr(chat_router, "render", broken_render)
+    assert chat_router.answer("session_1", "How much does device protection cost?") is None
+    assert chat_router.stats()["errors"] == 1
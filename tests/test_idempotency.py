@@ -0,0 +1,64 @@
+import asyncio
+
+from pymongo import ASCENDING
+
+
+def _store(server, mock_db):
+    database = mock_db()
+    asyncio.run(database.idempotency_keys.create_index([("key", ASCENDING)], unique=True))
+    return database, server.IdempotencyStore()
+
+
+def test_abandoned_key_is_taken_over_after_its_lease(server, mock_db, monkeypatch):
+    database, store = _store(server, mock_db)
+    monkeypatch.setattr(server, "IDEMPOTENCY_WAIT_SECONDS", 0.5)
+    asyncio.run(database.idempotency_keys.insert_one({
+        "key": "checkout:k1", "fingerprint": store._fingerprint({"plan": "basic"}),
+        "status": "in_progress", "owner": "dead-worker", "lease_until": server._utc_iso(-1),
+    }))
+
+    async def handler():
+        return {"session": "new"}
+
+    result = asyncio.run(store.run("checkout", "k1", {"plan": "basic"}, handler))
+    record = asyncio.run(database.idempotency_keys.find_one({"key": "checkout:k1"}))
+    assert result == {"session": "new"}
+    assert record["status"] == "completed" and record["owner"] != "dead-worker"
+    assert store.stats()["taken_over"] == 1
+
+
+def test_live_lease_is_waited_on_not_taken_over(server, mock_db, monkeypatch):
+    database, store = _store(server, mock_db)
+    monkeypatch.setattr(server, "IDEMPOTENCY_WAIT_SECONDS", 0.2)
+    asyncio.run(database.idempotency_keys.insert_one({
+        "key": "checkout:k1", "fingerprint": store._fingerprint({"plan": "basic"}),
+        "status": "in_progress", "owner": "busy-worker", "lease_until": server._utc_iso(60),
+    }))
+
+    async def handler():
+        raise AssertionError("must not run while another worker holds the key")
+
+    try:
+        asyncio.run(store.run("checkout", "k1", {"plan": "basic"}, handler))
+    except server.HTTPException as e:
+        assert e.status_code == 409
+    else:
+        raise AssertionError("expected 409")
+
+
+def test_failed_completion_write_frees_the_key(server, mock_db, monkeypatch):
+    database, store = _store(server, mock_db)
+    calls = []
+
+    async def failing_update(self, *args, **kwargs):
+        raise RuntimeError("primary stepped down")
+
+    monkeypatch.setattr(type(database.idempotency_keys), "update_one", failing_update)
+
+    async def handler():
+        calls.append(1)
+        return {"session": len(calls)}
+
+    assert asyncio.run(store.run("checkout", "k1", {"plan": "basic"}, handler)) == {"session": 1}
+    assert asyncio.run(database.idempotency_keys.count_documents({})) == 0
+    assert asyncio.run(store.run("checkout", "k1", {"plan": "basic"}, handler)) == {"session": 2}
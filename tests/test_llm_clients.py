@@ -0,0 +1,37 @@
+import asyncio
+
+
+def test_lru_trim_skips_sessions_mid_turn(server, fake_llm, mock_db, monkeypatch):
+    mock_db()
+    clients = server.LlmClientManager(max_sessions=2, ttl_seconds=60)
+    monkeypatch.setattr(clients, "_module", server.llm_clients._module)
+
+    async def scenario():
+        async with clients.session("busy"):
+            async with clients.session("idle"):
+                pass
+            async with clients.session("new"):
+                pass
+        return list(clients._sessions)
+
+    assert asyncio.run(scenario()) == ["busy", "new"]
+
+
+def test_failed_turn_evicts_the_chat_object(server, fake_llm, mock_db, monkeypatch):
+    mock_db()
+    monkeypatch.setattr(server.chat_router, "answer", lambda session_id, message: None)
+    monkeypatch.setattr(server.chat_response_cache, "get", lambda message: None)
+
+    async def failing_send(session_id, chat, user_message):
+        raise asyncio.TimeoutError()
+
+    async def scenario():
+        await server.send_chat_message(server.ChatMessageCreate(message="question 0", session_id="session_1"))
+        assert server.llm_clients.peek("session_1") is not None
+        monkeypatch.setattr(server.llm_hedger, "send", failing_send)
+        response = await server.send_chat_message(server.ChatMessageCreate(message="question 1", session_id="session_1"))
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.ai_response == server.CHAT_FALLBACK_RESPONSE
+    assert server.llm_clients.peek("session_1") is None
@@ -0,0 +1,68 @@
+import asyncio
+
+
+class FakeChat:
+    def __init__(self, delay, reply):
+        self.delay = delay
+        self.reply = reply
+
+    async def send_message(self, message):
+        await asyncio.sleep(self.delay)
+        return self.reply
+
+
+def hedged_send(server, monkeypatch, max_in_flight):
+    evicted = []
+    monkeypatch.setattr(server.llm_clients, "hedge_chat", lambda session_id: FakeChat(0.01, "hedge"))
+    monkeypatch.setattr(server.llm_clients, "evict", evicted.append)
+    scheduler = server.LlmScheduler(max_in_flight, 4, 1)
+    monkeypatch.setattr(server, "llm_scheduler", scheduler)
+    hedger = server.LlmHedger(True, 95, 0.05, 1.0)
+
+    async def scenario():
+        # The caller holds one slot for the primary call, as /chat does
+        async with scheduler.slot():
+            reply = await hedger.send("session_1", FakeChat(0.5, "primary"), "hi")
+            in_flight = scheduler.in_flight
+        return reply, in_flight
+
+    reply, in_flight = asyncio.run(scenario())
+    return reply, in_flight, hedger, evicted
+
+
+def test_hedge_win_evicts_the_session(server, monkeypatch):
+    reply, in_flight, hedger, evicted = hedged_send(server, monkeypatch, max_in_flight=2)
+    assert reply == "hedge"
+    assert hedger.won == 1
+    assert evicted == ["session_1"]
+    # The hedge's own slot is returned once it finishes
+    assert in_flight == 1
+
+
+def test_no_hedge_when_scheduler_is_saturated(server, monkeypatch):
+    reply, in_flight, hedger, evicted = hedged_send(server, monkeypatch, max_in_flight=1)
+    assert reply == "primary"
+    assert hedger.fired == 0
+    assert hedger.saturated == 1
+    assert evicted == []
+
+
+def test_hedge_chat_sees_turns_answered_by_the_primary(server, fake_llm, mock_db, monkeypatch):
+    mock_db()
+    monkeypatch.setattr(server, "llm_hedger", server.LlmHedger(True, 95, 0.02, 1.0))
+    monkeypatch.setattr(server, "llm_scheduler", server.LlmScheduler(4, 4, 1))
+
+    async def scenario():
+        for i in range(3):
+            # Only the last turn is slow enough on the primary model to be hedged
+            fake_llm.model_delays = {"gpt-5.1": 0.3 if i == 2 else 0.0}
+            await server.send_chat_message(server.ChatMessageCreate(message=f"question {i}", session_id="session_1"))
+
+    asyncio.run(scenario())
+
+    hedges = [chat for chat in fake_llm.built if chat.model == server.LLM_HEDGE_MODEL]
+    assert len(hedges) == 1
+    assert [m["content"] for m in hedges[0].initial_messages] == [
+        "question 0", "reply to question 0", "question 1", "reply to question 1",
+    ]
+    assert hedges[0].sent == ["question 2"]
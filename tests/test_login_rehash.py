@@ -0,0 +1,34 @@
+import asyncio
+from types import SimpleNamespace
+
+from pymongo.errors import AutoReconnect
+
+
+class Users:
+    def __init__(self, user):
+        self.user = user
+
+    async def find_one(self, query, projection=None):
+        return dict(self.user)
+
+    async def update_one(self, query, update):
+        raise AutoReconnect("connection reset")
+
+
+def test_login_succeeds_when_rehash_write_fails(server, monkeypatch):
+    stale_hash = server.bcrypt.hashpw(b"admin123", server.bcrypt.gensalt(rounds=4)).decode()
+    user = {
+        "id": "user-1",
+        "email": "admin@guardianai.com",
+        "password": stale_hash,
+        "name": "Admin",
+        "role": "admin",
+        "created_at": "2026-01-01T00:00:00+00:00",
+    }
+    monkeypatch.setattr(server, "db", SimpleNamespace(users=Users(user)))
+    assert server.password_needs_rehash(stale_hash)
+
+    credentials = server.UserLogin(email="admin@guardianai.com", password="admin123")
+    response = asyncio.run(server.login(credentials))
+    assert response.user.id == "user-1"
+    assert response.access_token
@@ -0,0 +1,25 @@
+import asyncio
+import time
+
+
+def test_settlement_between_read_and_wait_is_not_missed(server, mock_db, monkeypatch):
+    database = mock_db()
+    asyncio.run(database.payment_transactions.insert_one({
+        "session_id": "cs_1", "payment_status": "unpaid", "status": "open",
+        "amount": 49.0, "currency": "usd", "status_checked_at": server._utc_iso(),
+    }))
+    read_status = server.get_payment_status
+
+    async def read_then_settle(session_id):
+        current = await read_status(session_id)
+        # The webhook lands after the read, before the long-poll starts waiting
+        await server.record_payment_status(session_id, "paid", "complete")
+        return current
+
+    monkeypatch.setattr(server, "get_payment_status", read_then_settle)
+
+    started = time.monotonic()
+    result = asyncio.run(server.wait_for_payment_status("cs_1", timeout=5))
+    assert result.payment_status == "paid"
+    assert time.monotonic() - started < 1
+    assert server.payment_status_broker.stats()["waiters"] == 0
@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+
+def catalog(pricing):
+    service = {"id": "svc-1", "title": "Data & Device Protection", "pricing": pricing}
+    return SimpleNamespace(services=[service], version=3)
+
+
+def test_malformed_plan_is_skipped_without_dropping_the_rest(server):
+    index = server.PricingIndex()
+    index.rebuild(catalog([
+        {"id": "data-protection-monthly", "name": "Monthly Plan", "price": 249, "period": "month"},
+        {"name": "Add-on", "price": 20},
+    ]))
+    assert index.catalog_version == 3
+    assert index.resolve("svc-1", "data-protection-monthly")["amount"] == 249
+
+
+def test_plan_must_belong_to_service(server):
+    index = server.PricingIndex()
+    index.rebuild(catalog([{"id": "data-protection-monthly", "name": "Monthly Plan", "price": 199, "period": "month"}]))
+    with pytest.raises(HTTPException) as excinfo:
+        index.resolve("svc-2", "data-protection-monthly")
+    assert excinfo.value.status_code == 400
+
+
+def test_service_update_rejects_incomplete_plan(server):
+    with pytest.raises(ValueError):
+        server.ServiceUpdate(pricing=[{"name": "Add-on", "price": 20}])
@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+
+from pymongo.errors import AutoReconnect
+
+
+class FlakyWebhookEvents:
+    """Hands out queued events; the first update_one raises like a dropped connection"""
+
+    def __init__(self, events):
+        self.events = list(events)
+        self.updates = []
+        self.failures = 1
+
+    async def find_one_and_update(self, *args, **kwargs):
+        return self.events.pop(0) if self.events else None
+
+    async def update_one(self, query, update):
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("connection reset")
+        self.updates.append((query, update))
+
+
+def test_consumer_survives_failed_status_update(server, monkeypatch):
+    events = FlakyWebhookEvents([
+        {"event_id": "evt_1", "event_type": "checkout.session.completed", "payment_status": "unpaid"},
+        {"event_id": "evt_2", "event_type": "checkout.session.completed", "payment_status": "unpaid"},
+    ])
+    monkeypatch.setattr(server, "db", SimpleNamespace(webhook_events=events))
+    monkeypatch.setattr(server, "WEBHOOK_POLL_SECONDS", 0.01)
+
+    async def scenario():
+        consumer = server.WebhookEventConsumer()
+        task = asyncio.create_task(consumer.run())
+        await asyncio.sleep(0.1)
+        assert not task.done(), task.exception()
+        task.cancel()
+        return consumer
+
+    consumer = asyncio.run(scenario())
+    assert [query["event_id"] for query, _ in events.updates] == ["evt_2"]
+    assert consumer.applied == 1